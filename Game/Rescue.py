@@ -1,5 +1,8 @@
+import argparse
 import pygame
-import random
+import sys
+from session import Session
+from entity_pool import EntityPool
 
 # Pygame setup
 pygame.init()
@@ -9,6 +12,17 @@ pygame.display.set_caption("Quantum Rescue: Schr\u00f6dinger's Crew")
 clock = pygame.time.Clock()
 FPS = 60
 
+# Command line
+parser = argparse.ArgumentParser(description="Quantum Rescue: Schrodinger's Crew")
+parser.add_argument("--crew", type=int, default=0,
+                    help="start with this many extra crew queued off-screen (stress test)")
+args = parser.parse_args()
+
+# Input, frame pacing and seeded random streams (see session.py)
+session = Session.from_env("Rescue", [pygame.K_UP, pygame.K_DOWN, pygame.K_x, pygame.K_z, pygame.K_h],
+                           sys.argv[1:])
+spawn_rng = session.rng.spawn
+
 # Colors
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
@@ -25,8 +39,11 @@ font = pygame.font.SysFont('Arial', 24)
 # Player ship
 ship = pygame.Rect(100, SCREEN_HEIGHT // 2 - 20, 40, 20)
 
-# Crew
-crew = []
+# Crew: a fixed pool, recycled once a crew member leaves the screen
+# (see entity_pool.py)
+CREW_CAPACITY = 16
+crew = EntityPool(CREW_CAPACITY + args.crew,
+                  lambda: {"rect": pygame.Rect(0, 0, 30, 20), "state": "|0>", "saved": False})
 crew_spawn_delay = 120  # frames
 crew_timer = 0
 
@@ -34,11 +51,15 @@ crew_timer = 0
 def draw_ship():
     pygame.draw.rect(screen, GREEN if not quantum_mode else BLUE, ship)
 
+# Bring a crew member in from the right edge; None if the pool is used up
 def spawn_crew():
-    y = random.randint(0, SCREEN_HEIGHT - 20)
-    state = random.choice(["|0>", "|1>", "|+>", "|->"])
-    rect = pygame.Rect(SCREEN_WIDTH, y, 30, 20)
-    return {"rect": rect, "state": state, "saved": False}
+    c = crew.acquire()
+    if c is None:
+        return None
+    c["rect"].topleft = (SCREEN_WIDTH, spawn_rng.randint(0, SCREEN_HEIGHT - 20))
+    c["state"] = spawn_rng.choice(["|0>", "|1>", "|+>", "|->"])
+    c["saved"] = False
+    return c
 
 def draw_crew():
     for c in crew:
@@ -49,6 +70,8 @@ def draw_crew():
 def move_crew():
     for c in crew:
         c["rect"].x -= 2
+    # Crew that left the screen (or were picked up) go back to the pool
+    crew.cull(lambda c: c["rect"].right > 0)
 
 def check_rescue():
     global score
@@ -61,16 +84,21 @@ def check_rescue():
                 score -= 1
             c["rect"].x = -100
 
+# Stress test: extra crew queued off-screen to the right
+for _ in range(args.crew):
+    c = spawn_crew()
+    c["rect"].x += spawn_rng.randrange(SCREEN_WIDTH)
+
 # Main loop
 running = True
 while running:
     screen.fill(BLACK)
 
-    for event in pygame.event.get():
+    for event in session.events():
         if event.type == pygame.QUIT:
             running = False
 
-    keys = pygame.key.get_pressed()
+    keys = session.pressed()
 
     if keys[pygame.K_UP]: ship.y -= 5
     if keys[pygame.K_DOWN]: ship.y += 5
@@ -101,7 +129,7 @@ while running:
     # Crew spawn
     crew_timer += 1
     if crew_timer >= crew_spawn_delay:
-        crew.append(spawn_crew())
+        spawn_crew()
         crew_timer = 0
 
     move_crew()
@@ -117,7 +145,8 @@ while running:
     screen.blit(score_surf, (10, 40))
 
     pygame.display.flip()
-    clock.tick(FPS)
+    session.tick(clock, FPS)
 
+session.finish(score=score, state=player_state)
 pygame.quit()
 
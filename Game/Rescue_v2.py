@@ -1,12 +1,30 @@
+import argparse
 import pygame
-import random
-import os
+import sys
+from collision import find_contacts
+from session import Session
+from assets import Assets
+from sounds import SoundService
+from frame_timer import FrameTimer
+from ring_buffer import RectRing
 
 # Constants
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 640
 FPS = 30
 
+# Command line
+parser = argparse.ArgumentParser(description="Quantum Rescue: Schrodinger's Crew")
+parser.add_argument("--hazards", type=int, default=0,
+                    help="start with this many extra hazards queued off-screen (stress test)")
+parser.add_argument("--fire-rate", type=int, default=FPS,
+                    help=f"rockets fired per second while SPACE is held (1-{FPS}, default one a frame)")
+parser.add_argument("--burst", type=int, default=0,
+                    help="rockets fired per press of SPACE (default 0, no limit)")
+args = parser.parse_args()
+if not 0 < args.fire_rate <= FPS:
+    parser.error(f"--fire-rate must be between 1 and {FPS} (at most one rocket a frame)")
+
 # Quantum States
 STATES = ["|0>", "|1>", "|+>", "|->"]
 
@@ -17,33 +35,40 @@ pygame.display.set_caption("Quantum Rescue: Schrödinger's Crew")
 clock = pygame.time.Clock()
 font = pygame.font.SysFont('Arial', 24)
 
-# Load images
-spaceship_img = pygame.image.load(os.path.join("assets", "spaceship.png"))
-spaceship_img = pygame.transform.scale(spaceship_img, (60, 40))
+# Input, frame pacing and seeded random streams (see session.py)
+session = Session.from_env("Rescue_v2", [pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT,
+                                         pygame.K_x, pygame.K_z, pygame.K_h, pygame.K_SPACE], sys.argv[1:])
+spawn_rng = session.rng.spawn
+gate_rng = session.rng.gates
+# Per-phase frame timings, enabled with QE_PROFILE (see frame_timer.py)
+timer = FrameTimer.from_env("Rescue_v2")
+
+# Load images (pre-scaled and display-converted, see assets.py)
+assets = Assets()
 
-crew_img = pygame.image.load(os.path.join("assets", "crew.png"))
-crew_img = pygame.transform.scale(crew_img, (20, 20))
+spaceship_img = assets.image("spaceship.png", (60, 40))
 
-hazard_img = pygame.image.load(os.path.join("assets", "hazard.png"))
-hazard_img = pygame.transform.scale(hazard_img, (20, 20))
+crew_img = assets.image("crew.png", (20, 20))
 
-intruder_img = pygame.image.load(os.path.join("assets", "intruder.png"))
-intruder_img = pygame.transform.scale(intruder_img, (60, 40))
+hazard_img = assets.image("hazard.png", (20, 20))
+
+intruder_img = assets.image("intruder.png", (60, 40))
 
 # rocket_img = pygame.image.load(os.path.join("assets", "rocket.png"))
 # rocket_img = pygame.transform.scale(rocket_img, (10, 4))
 rocket_img = pygame.Surface((10, 4))
 rocket_img.fill((255, 0, 0))
 
-bullet_img = pygame.image.load(os.path.join("assets", "bullet.png"))
-bullet_img = pygame.transform.scale(bullet_img, (25, 25))
+bullet_img = assets.image("bullet.png", (25, 25))
 
-powerup_img = pygame.image.load(os.path.join("assets", "powerup.png"))
-powerup_img = pygame.transform.scale(powerup_img, (20, 20))
+powerup_img = assets.image("powerup.png", (20, 20))
 
-# Sounds
-rescue_sound = pygame.mixer.Sound(os.path.join("assets", "rescue.wav"))
-eliminate_sound = pygame.mixer.Sound(os.path.join("assets", "explode.wav"))
+# Sounds: decoded on first use or in the background, played through a
+# small channel pool (see sounds.py)
+sounds = SoundService(assets)
+sounds.add("rescue", "rescue.wav", priority=1, min_gap=5)
+sounds.add("eliminate", "explode.wav", priority=2, min_gap=5)
+sounds.prefetch()
 
 # Ship
 ship = pygame.Rect(100, SCREEN_HEIGHT // 2, 60, 40)
@@ -61,6 +86,10 @@ crew_timer = 0
 hazards = []
 HAZARD_INTERVAL = 90
 hazard_timer = 0
+# Stress test: extra hazards queued off-screen to the right
+for _ in range(args.hazards):
+    y = spawn_rng.randint(0, SCREEN_HEIGHT - 20)
+    hazards.append(pygame.Rect(SCREEN_WIDTH + spawn_rng.randrange(SCREEN_WIDTH), y, 20, 20))
 
 # Intruders
 intruders = []
@@ -68,8 +97,18 @@ INTRUDER_INTERVAL = 70
 intruder_timer = 0
 intruder_bullets = []
 
-# Rockets
-rockets = []
+# Rockets: SPACE fires args.fire_rate a second, up to args.burst per press.
+# rocket_credit gains args.fire_rate every frame and a rocket costs FPS of
+# it, so rates that don't divide FPS keep their fractional frames; while no
+# rocket can be fired it is held at one frame short of the next shot. They
+# all fly at the same speed and leave in the order they were fired, so they
+# live in a ring of preallocated rects (see ring_buffer.py) sized for the
+# most that can be on screen at once
+ROCKET_SPEED = 10
+ROCKET_FLIGHT = SCREEN_WIDTH // ROCKET_SPEED + 1  # frames on screen
+rockets = RectRing(-(-ROCKET_FLIGHT * args.fire_rate // FPS) + 1, 10, 4)
+rocket_credit = FPS - args.fire_rate
+burst_left = args.burst or -1  # -1: no limit
 
 # Power-ups
 powerups = []
@@ -112,12 +151,15 @@ def apply_gate(gate):
 
 running = True
 while running:
+    timer.start()
     screen.fill((0, 0, 0))
-    for event in pygame.event.get():
+    timer.mark("draw")
+    for event in session.events():
         if event.type == pygame.QUIT:
             running = False
+    timer.mark("events")
 
-    keys = pygame.key.get_pressed()
+    keys = session.pressed()
     if keys[pygame.K_UP]:
         ship.move_ip(0, -5)
     if keys[pygame.K_DOWN]:
@@ -132,11 +174,20 @@ while running:
         apply_gate("Z")
     if keys[pygame.K_h]:
         apply_gate("H")
-    if keys[pygame.K_SPACE]:
-        rockets.append(pygame.Rect(ship.centerx, ship.centery - 2, 10, 4))
+    rocket_credit += args.fire_rate
+    if keys[pygame.K_SPACE] and burst_left != 0:
+        if rocket_credit >= FPS and rockets.push(ship.centerx, ship.centery - 2):
+            rocket_credit -= FPS
+            burst_left -= 1
+        elif rocket_credit >= FPS:
+            rocket_credit = FPS - args.fire_rate
+    else:
+        rocket_credit = min(rocket_credit, FPS - args.fire_rate)
+        if not keys[pygame.K_SPACE]:
+            burst_left = args.burst or -1
 
     # Random gate application
-    rand = random.randint(0, 300)
+    rand = gate_rng.randint(0, 300)
     if rand in [100, 200]:
         apply_gate("X")
     elif rand in [50, 250]:
@@ -146,38 +197,40 @@ while running:
 
     # Constrain ship
     ship.clamp_ip(pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT))
+    timer.mark("input")
 
     # Spawn crew
     crew_timer += 1
     if crew_timer >= CREW_INTERVAL:
-        crew_state = random.choice(STATES)
-        y = random.randint(0, SCREEN_HEIGHT - 20)
+        crew_state = spawn_rng.choice(STATES)
+        y = spawn_rng.randint(0, SCREEN_HEIGHT - 20)
         crew_members.append({"rect": pygame.Rect(SCREEN_WIDTH, y, 20, 20), "state": crew_state})
         crew_timer = 0
 
     # Spawn hazards
     hazard_timer += 1
     if hazard_timer >= HAZARD_INTERVAL:
-        y = random.randint(0, SCREEN_HEIGHT - 20)
+        y = spawn_rng.randint(0, SCREEN_HEIGHT - 20)
         hazards.append(pygame.Rect(SCREEN_WIDTH, y, 20, 20))
         hazard_timer = 0
 
     # Spawn intruders
     intruder_timer += 1
     if intruder_timer >= INTRUDER_INTERVAL:
-        y = random.randint(0, SCREEN_HEIGHT - 40)
+        y = spawn_rng.randint(0, SCREEN_HEIGHT - 40)
         rect = pygame.Rect(SCREEN_WIDTH, y, 60, 40)
         intruders.append(rect)
-        if random.random() < 0.7:
+        if spawn_rng.random() < 0.7:
             intruder_bullets.append(pygame.Rect(rect.left, rect.centery, 6, 4))
         intruder_timer = 0
 
     # Spawn power-ups
     powerup_timer += 1
     if powerup_timer >= POWERUP_INTERVAL:
-        y = random.randint(0, SCREEN_HEIGHT - 20)
+        y = spawn_rng.randint(0, SCREEN_HEIGHT - 20)
         powerups.append(pygame.Rect(SCREEN_WIDTH, y, 20, 20))
         powerup_timer = 0
+    timer.mark("spawn")
 
     # Update positions
     for crew in crew_members:
@@ -186,72 +239,92 @@ while running:
         hazard.move_ip(-8, 0)
     for intruder in intruders:
         intruder.move_ip(-6, 0)
-    for rocket in rockets[:]:
-        rocket.move_ip(10, 0)
-        if rocket.left > SCREEN_WIDTH:
-            rockets.remove(rocket)
-    for bullet in intruder_bullets[:]:
+    for rocket in rockets:
+        rocket.move_ip(ROCKET_SPEED, 0)
+    for bullet in intruder_bullets:
         bullet.move_ip(-8, 0)
-        if bullet.right < 0:
-            intruder_bullets.remove(bullet)
-    for powerup in powerups[:]:
+    for powerup in powerups:
         powerup.move_ip(-3, 0)
-
-    # Check collisions
-    for crew in crew_members[:]:
-        if ship.colliderect(crew["rect"]):
-            if crew["state"] == ship_state:
-                crew_members.remove(crew)
-                score += 1
-                rescue_sound.play()
-                message = "Crew rescued!"
-                message_timer = 60
-            else:
-                # Gates flipped, crew acts as hazard
-                crew_members.remove(crew)
-                health -= 20
-                message = "Hit by crew hazard!"
-                message_timer = 60
-
-    for hazard in hazards[:]:
-        if ship.colliderect(hazard):
-            hazards.remove(hazard)
-            health -= 20
-            message = "Hit by hazard!"
-            message_timer = 60
-
-    for intruder in intruders[:]:
-        if ship.colliderect(intruder):
-            health -= 40
-            message = "Collided with intruder!"
+    timer.mark("movement")
+
+    # Check collisions: one broad-phase pass finds every contact pair
+    contacts = find_contacts(
+        {
+            "ship": [ship],
+            "rocket": rockets,
+            "crew": [crew["rect"] for crew in crew_members],
+            "hazard": hazards,
+            "intruder": intruders,
+            "bullet": intruder_bullets,
+            "powerup": powerups,
+        },
+        [("ship", "crew"), ("ship", "hazard"), ("ship", "intruder"),
+         ("rocket", "intruder"), ("ship", "bullet"), ("ship", "powerup")],
+    )
+    # Hit objects are collected here and removed in bulk afterwards
+    removed = {"crew": set(), "hazard": set(), "intruder": set(), "rocket": set(),
+               "bullet": set(), "powerup": set()}
+
+    for _, i in contacts[("ship", "crew")]:
+        removed["crew"].add(i)
+        if crew_members[i]["state"] == ship_state:
+            score += 1
+            sounds.play("rescue")
+            message = "Crew rescued!"
             message_timer = 60
-        for rocket in rockets[:]:
-            if rocket.colliderect(intruder):
-                intruders.remove(intruder)
-                rockets.remove(rocket)
-                eliminate_sound.play()
-                message = "Intruder eliminated!"
-                message_timer = 30
-                break
-
-    for bullet in intruder_bullets[:]:
-        if ship.colliderect(bullet):
-            intruder_bullets.remove(bullet)
-            health -= 10
-            message = "Hit by bullet!"
+        else:
+            # Gates flipped, crew acts as hazard
+            health -= 20
+            message = "Hit by crew hazard!"
             message_timer = 60
 
-    for powerup in powerups[:]:
-        if ship.colliderect(powerup):
-            powerups.remove(powerup)
-            health = min(health + 30, 100)
-            message = "Power-up collected!"
-            message_timer = 60
+    for _, i in contacts[("ship", "hazard")]:
+        removed["hazard"].add(i)
+        health -= 20
+        message = "Hit by hazard!"
+        message_timer = 60
+
+    for _ in contacts[("ship", "intruder")]:
+        health -= 40
+        message = "Collided with intruder!"
+        message_timer = 60
+
+    # Each rocket destroys at most one intruder, and vice versa
+    for r, i in sorted(contacts[("rocket", "intruder")], key=lambda pair: (pair[1], pair[0])):
+        if r not in removed["rocket"] and i not in removed["intruder"]:
+            removed["rocket"].add(r)
+            removed["intruder"].add(i)
+            sounds.play("eliminate")
+            message = "Intruder eliminated!"
+            message_timer = 30
+
+    for _, i in contacts[("ship", "bullet")]:
+        removed["bullet"].add(i)
+        health -= 10
+        message = "Hit by bullet!"
+        message_timer = 60
+
+    for _, i in contacts[("ship", "powerup")]:
+        removed["powerup"].add(i)
+        health = min(health + 30, 100)
+        message = "Power-up collected!"
+        message_timer = 60
+
+    # Bulk removal of hit and off-screen objects
+    crew_members = [c for i, c in enumerate(crew_members) if i not in removed["crew"] and c["rect"].right > 0]
+    hazards = [h for i, h in enumerate(hazards) if i not in removed["hazard"] and h.right > 0]
+    intruders = [t for i, t in enumerate(intruders) if i not in removed["intruder"] and t.right > 0]
+    for i in removed["rocket"]:
+        rockets.kill(i)
+    rockets.expire(lambda r: r.left > SCREEN_WIDTH)
+    intruder_bullets = [b for i, b in enumerate(intruder_bullets) if i not in removed["bullet"] and b.right >= 0]
+    powerups = [p for i, p in enumerate(powerups) if i not in removed["powerup"] and p.right > 0]
 
     if health <= 0:
         message = "Game Over!"
         message_timer = 120
         running = False
+    timer.mark("collision")
 
     # Draw ship
     screen.blit(spaceship_img, ship)
@@ -278,7 +351,8 @@ while running:
 
     # Draw rockets
     for rocket in rockets:
-        screen.blit(rocket_img, rocket)
+        if rocket.width:
+            screen.blit(rocket_img, rocket)
 
     # Draw power-ups with image
     for powerup in powerups:
@@ -295,8 +369,15 @@ while running:
         msg = font.render(message, True, (255, 255, 255))
         screen.blit(msg, (SCREEN_WIDTH//2 - msg.get_width()//2, SCREEN_HEIGHT//2 - msg.get_height()//2))
         message_timer -= 1
+    timer.mark("draw")
+    timer.draw_overlay(screen, font)
+    sounds.update()
 
     pygame.display.flip()
-    clock.tick(FPS)
+    timer.mark("flip")
+    timer.end_frame()
+    session.tick(clock, FPS)
 
+session.finish(score=score, health=health, state=ship_state)
+timer.export()
 pygame.quit()
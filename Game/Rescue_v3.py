@@ -1,12 +1,24 @@
+import argparse
 import pygame
-import random
-import os
+import sys
+from session import Session
+from assets import Assets
+from sounds import SoundService
+from frame_timer import FrameTimer
+from entity_store import EntityStore
+from collision import ColumnIndex
 
 # Constants
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 640
 FPS = 30
 
+# Command line
+parser = argparse.ArgumentParser(description="Photonic Ship: Quantum Rescue")
+parser.add_argument("--hazards", type=int, default=0,
+                    help="start with this many extra hazards queued off-screen (stress test)")
+args = parser.parse_args()
+
 # Quantum States
 STATES = ["|0>", "|1>", "|+>", "|->"]
 
@@ -17,28 +29,35 @@ pygame.display.set_caption("Photonic Ship: Quantum Rescue")
 clock = pygame.time.Clock()
 font = pygame.font.SysFont('Arial', 24)
 
-# Load images
-spaceship_img = pygame.image.load(os.path.join("assets", "spaceship.png"))
-spaceship_img = pygame.transform.scale(spaceship_img, (60, 40))
+# Input, frame pacing and seeded random streams (see session.py)
+session = Session.from_env("Rescue_v3", [pygame.K_UP, pygame.K_DOWN, pygame.K_x, pygame.K_z, pygame.K_h],
+                           sys.argv[1:])
+spawn_rng = session.rng.spawn
+gate_rng = session.rng.gates
+collapse_rng = session.rng.collapse
+# Per-phase frame timings, enabled with QE_PROFILE (see frame_timer.py)
+timer = FrameTimer.from_env("Rescue_v3")
+
+# Load images (pre-scaled and display-converted, see assets.py)
+assets = Assets()
+
+spaceship_img = assets.image("spaceship.png", (60, 40))
 
-crew_img = pygame.image.load(os.path.join("assets", "crew.png"))
-crew_img = pygame.transform.scale(crew_img, (20, 20))
+crew_img = assets.image("crew.png", (20, 20))
 
-hazard_img = pygame.image.load(os.path.join("assets", "hazard.png"))
-hazard_img = pygame.transform.scale(hazard_img, (20, 20))
+hazard_img = assets.image("hazard.png", (20, 20))
 
-intruder_img = pygame.image.load(os.path.join("assets", "intruder.png"))
-intruder_img = pygame.transform.scale(intruder_img, (60, 40))
+intruder_img = assets.image("intruder.png", (60, 40))
 
-bullet_img = pygame.image.load(os.path.join("assets", "bullet.png"))
-bullet_img = pygame.transform.scale(bullet_img, (25, 25))
+bullet_img = assets.image("bullet.png", (25, 25))
 
-powerup_img = pygame.image.load(os.path.join("assets", "powerup.png"))
-powerup_img = pygame.transform.scale(powerup_img, (20, 20))
+powerup_img = assets.image("powerup.png", (20, 20))
 
-# Sounds
-rescue_sound = pygame.mixer.Sound(os.path.join("assets", "rescue.wav"))
-eliminate_sound = pygame.mixer.Sound(os.path.join("assets", "explode.wav"))
+# Sounds: decoded on first use, played through a small channel pool
+# (see sounds.py)
+sounds = SoundService(assets)
+sounds.add("rescue", "rescue.wav", priority=1, min_gap=5)
+sounds.add("eliminate", "explode.wav", priority=2, min_gap=5)
 
 # Ship class to handle ship and twinship
 class Ship:
@@ -79,6 +98,10 @@ class Ship:
         self.twinship = None
         self.quantum_mode = False
 
+    # The ship plus its twin while in superposition
+    def ships(self):
+        return [self, self.twinship] if self.twinship else [self]
+
 # Initialize main ship in upper half, |0> state
 ship = Ship(100, SCREEN_HEIGHT // 4, "|0>")
 
@@ -87,26 +110,39 @@ score = 0
 message = ""
 message_timer = 0
 
-# Enemies and objects
-crew_members = []
+# Enemies and objects: position, size and velocity arrays per kind, moved
+# and culled in bulk (see entity_store.py). Crew carry their state's index
+# in STATES as their tag
+entities = EntityStore()
+crew_members = entities.add("crew", (20, 20), (-5, 0))
 CREW_INTERVAL = 60
 crew_timer = 0
 
-hazards = []
+hazards = entities.add("hazard", (20, 20), (-8, 0), capacity=max(64, args.hazards))
 HAZARD_INTERVAL = 90
 hazard_timer = 0
-
-intruders = []
+# Stress test: extra hazards queued off-screen to the right
+extra = []
+for _ in range(args.hazards):
+    y = spawn_rng.randint(0, SCREEN_HEIGHT - 20)
+    extra.append((SCREEN_WIDTH + spawn_rng.randrange(SCREEN_WIDTH), y))
+if extra:
+    hazards.spawn([x for x, _ in extra], [y for _, y in extra])
+
+intruders = entities.add("intruder", (60, 40), (-6, 0))
 INTRUDER_INTERVAL = 70
 intruder_timer = 0
-intruder_bullets = []
+intruder_bullets = entities.add("bullet", (6, 4), (-10, 0))
 
-rockets = []
+rockets = entities.add("rocket", (10, 4), (10, 0))
 
-powerups = []
+powerups = entities.add("powerup", (20, 20), (-4, 0))
 POWERUP_INTERVAL = 400
 powerup_timer = 0
 
+# What the ships can crash into, indexed once per frame after moving
+hostiles = ColumnIndex((hazards, intruders, intruder_bullets), SCREEN_WIDTH)
+
 # Colors for states
 colors = {
     "|0>": (0, 255, 0),
@@ -164,7 +200,7 @@ def measure():
     # Measurement collapses superposition into classical state randomly
     if ship.quantum_mode:
         # Pick random int 1-100, even -> |0>, odd -> |1>
-        observed = "|0>" if random.randint(1, 100) % 2 == 0 else "|1>"
+        observed = "|0>" if collapse_rng.randint(1, 100) % 2 == 0 else "|1>"
         ship.state = observed
         # Set position accordingly
         if observed == "|0>":
@@ -187,32 +223,34 @@ def measure():
             return False
     return False
 
+# Hits per ship against hazards, intruders and bullets, from this frame's index
+def ship_hits(ships):
+    return hostiles.query([s.rect for s in ships])
+
+# Check if any of the ships collides with hazards or intruders
+def collision_check(ships):
+    return any(ship_hits(ships))
+
 def check_collision_after_measure():
     # Check collision after measurement collapse
     # Just check if ship hits hazards or intruders immediately
-    for hazard in hazards:
-        if ship.rect.colliderect(hazard):
-            return True
-    for intruder in intruders:
-        if ship.rect.colliderect(intruder):
-            return True
-    for bullet in intruder_bullets:
-        if ship.rect.colliderect(bullet):
-            return True
-    return False
+    return collision_check([ship])
 
 running = True
 while running:
+    timer.start()
     screen.fill((0, 0, 0))
 
     # Draw center line splitting the screen into |0> and |1>
     pygame.draw.line(screen, (255, 255, 255), (0, SCREEN_HEIGHT//2), (SCREEN_WIDTH, SCREEN_HEIGHT//2), 2)
+    timer.mark("draw")
 
-    for event in pygame.event.get():
+    for event in session.events():
         if event.type == pygame.QUIT:
             running = False
+    timer.mark("events")
 
-    keys = pygame.key.get_pressed()
+    keys = session.pressed()
 
     # Movement and gates input only if not in quantum mode or allowed
     if not ship.quantum_mode:
@@ -223,20 +261,13 @@ while running:
             ship.update_position(5)
     else:
         # In quantum mode, arrow keys move enemies only
+        # (wrapping around vertical screen)
         if keys[pygame.K_UP]:
-            for enemy in hazards + intruders + crew_members:
-                enemy_rect = enemy if isinstance(enemy, pygame.Rect) else enemy['rect']
-                enemy_rect.top -= 5
-                # Wrap around vertical screen
-                if enemy_rect.top < 0:
-                    enemy_rect.top = SCREEN_HEIGHT - enemy_rect.height
+            for enemies in (hazards, intruders, crew_members):
+                enemies.scroll(-5, SCREEN_HEIGHT)
         if keys[pygame.K_DOWN]:
-            for enemy in hazards + intruders + crew_members:
-                enemy_rect = enemy if isinstance(enemy, pygame.Rect) else enemy['rect']
-                enemy_rect.top += 5
-                # Wrap around vertical screen
-                if enemy_rect.top > SCREEN_HEIGHT - enemy_rect.height:
-                    enemy_rect.top = 0
+            for enemies in (hazards, intruders, crew_members):
+                enemies.scroll(5, SCREEN_HEIGHT)
 
     # Gates
     if keys[pygame.K_x]:
@@ -247,126 +278,79 @@ while running:
         apply_gate("H")
 
     # Random gate application as per Task 8
-    rand = random.randint(0, 300)
+    rand = gate_rng.randint(0, 300)
     if rand in [100, 200]:
         apply_gate("X")
     elif rand in [50, 250]:
         apply_gate("Z")
     elif rand == 150:
         apply_gate("H")
+    timer.mark("input")
 
     # Spawn crew members
     crew_timer += 1
     if crew_timer >= CREW_INTERVAL:
-        crew_state = random.choice(STATES)
-        y = random.randint(0, SCREEN_HEIGHT - 20)
-        crew_members.append({"rect": pygame.Rect(SCREEN_WIDTH, y, 20, 20), "state": crew_state})
+        crew_state = spawn_rng.choice(STATES)
+        y = spawn_rng.randint(0, SCREEN_HEIGHT - 20)
+        crew_members.spawn(SCREEN_WIDTH, y, STATES.index(crew_state))
         crew_timer = 0
 
     # Spawn hazards
     hazard_timer += 1
     if hazard_timer >= HAZARD_INTERVAL:
-        y = random.randint(0, SCREEN_HEIGHT - 20)
-        hazards.append(pygame.Rect(SCREEN_WIDTH, y, 20, 20))
+        y = spawn_rng.randint(0, SCREEN_HEIGHT - 20)
+        hazards.spawn(SCREEN_WIDTH, y)
         hazard_timer = 0
 
     # Spawn intruders
     intruder_timer += 1
     if intruder_timer >= INTRUDER_INTERVAL:
-        y = random.randint(0, SCREEN_HEIGHT - 40)
-        rect = pygame.Rect(SCREEN_WIDTH, y, 60, 40)
-        intruders.append(rect)
+        y = spawn_rng.randint(0, SCREEN_HEIGHT - 40)
+        intruders.spawn(SCREEN_WIDTH, y)
         # Intruder fires bullet sometimes
-        if random.random() < 0.7:
-            intruder_bullets.append(pygame.Rect(rect.left, rect.centery, 6, 4))
+        if spawn_rng.random() < 0.7:
+            intruder_bullets.spawn(SCREEN_WIDTH, y + 20)
         intruder_timer = 0
 
     # Spawn power-ups
     powerup_timer += 1
     if powerup_timer >= POWERUP_INTERVAL:
-        y = random.randint(0, SCREEN_HEIGHT - 20)
-        powerups.append(pygame.Rect(SCREEN_WIDTH, y, 20, 20))
+        y = spawn_rng.randint(0, SCREEN_HEIGHT - 20)
+        powerups.spawn(SCREEN_WIDTH, y)
         powerup_timer = 0
+    timer.mark("spawn")
 
-    # Move all enemies and objects leftwards
-    for crew in crew_members:
-        crew["rect"].move_ip(-5, 0)
-    for hazard in hazards:
-        hazard.move_ip(-8, 0)
-    for intruder in intruders:
-        intruder.move_ip(-6, 0)
-    for rocket in rockets[:]:
-        rocket.move_ip(10, 0)
-        if rocket.left > SCREEN_WIDTH:
-            rockets.remove(rocket)
-    for bullet in intruder_bullets[:]:
-        bullet.move_ip(-10, 0)
-        if bullet.right < 0:
-            intruder_bullets.remove(bullet)
-    for powerup in powerups:
-        powerup.move_ip(-4, 0)
-
-    # Remove off-screen objects
-    crew_members = [c for c in crew_members if c["rect"].right > 0]
-    hazards = [h for h in hazards if h.right > 0]
-    intruders = [i for i in intruders if i.right > 0]
-    powerups = [p for p in powerups if p.right > 0]
-
-    # Draw crew
-    for crew in crew_members:
-        img = crew_img
-        screen.blit(img, crew["rect"])
-
-    # Draw hazards
-    for hazard in hazards:
-        screen.blit(hazard_img, hazard)
-
-    # Draw intruders
-    for intruder in intruders:
-        screen.blit(intruder_img, intruder)
-    for bullet in intruder_bullets:
-        screen.blit(bullet_img, bullet)
-
-    # Draw powerups
-    for powerup in powerups:
-        screen.blit(powerup_img, powerup)
+    # Move all enemies and objects, and remove off-screen ones
+    entities.move()
+    entities.cull(SCREEN_WIDTH)
+    hostiles.build()
+    timer.mark("movement")
+
+    # Draw crew, hazards, intruders and their bullets, and powerups
+    for kind, img in ((crew_members, crew_img), (hazards, hazard_img), (intruders, intruder_img),
+                      (intruder_bullets, bullet_img), (powerups, powerup_img)):
+        screen.blits(((img, pos) for pos in kind.positions(SCREEN_WIDTH)), doreturn=False)
 
     # Draw ship and twinship
     ship.draw(screen)
     if ship.twinship:
         ship.twinship.draw(screen)
+    timer.mark("draw")
 
     # Collision detection
     # Check if ship or twinship collides with hazards or intruders
-    def collision_check():
-        for hazard in hazards:
-            if ship.rect.colliderect(hazard):
-                return True
-            if ship.twinship and ship.twinship.rect.colliderect(hazard):
-                return True
-        for intruder in intruders:
-            if ship.rect.colliderect(intruder):
-                return True
-            if ship.twinship and ship.twinship.rect.colliderect(intruder):
-                return True
-        for bullet in intruder_bullets:
-            if ship.rect.colliderect(bullet):
-                return True
-            if ship.twinship and ship.twinship.rect.colliderect(bullet):
-                return True
-        return False
-
     if ship.quantum_mode:
         # If collision in superposition, measure collapse and check result
-        if collision_check():
+        if collision_check(ship.ships()):
             game_over = measure()
             if game_over:
                 message = "Game Over!"
                 running = False
     else:
-        if collision_check():
+        if collision_check(ship.ships()):
             message = "Game Over!"
             running = False
+    timer.mark("collision")
 
     # Display state on top-right corner
     state_text = font.render(f"State: {ship.state}", True, colors.get(ship.state, (255, 255, 255)))
@@ -377,8 +361,15 @@ while running:
         msg_surface = font.render(message, True, (255, 255, 255))
         screen.blit(msg_surface, (20, SCREEN_HEIGHT - 40))
         message_timer -= 1
+    timer.mark("draw")
+    timer.draw_overlay(screen, font)
+    sounds.update()
 
     pygame.display.flip()
-    clock.tick(FPS)
+    timer.mark("flip")
+    timer.end_frame()
+    session.tick(clock, FPS)
 
+session.finish(score=score, health=ship.health, state=ship.state)
+timer.export()
 pygame.quit()
@@ -1,6 +1,13 @@
+import argparse
 import pygame
-import random
+import heapq
 import math
+import sys
+from time import perf_counter
+import numpy as np
+from session import Session
+from frame_timer import FrameTimer
+from text_cache import TextCache
 
 # Initialize Pygame
 pygame.init()
@@ -29,14 +36,41 @@ COLS = 10
 BUBBLE_RADIUS = 20
 GRID_TOP = 50
 GRID_LEFT = (WIDTH - (COLS * 2 * BUBBLE_RADIUS)) // 2
+# A shot whose centre reaches this line sticks in the top row
+CEILING = GRID_TOP + BUBBLE_RADIUS
 
 # Quantum states
 STATES = ['0', '1', '+', '-']
+# Quantum gates as lookup tables: state before -> state after.
+# X flips |0> <-> |1>, Z flips + <-> -, H switches basis and superposition
+GATES = {
+    'X': {'0': '1', '1': '0', '+': '+', '-': '-'},
+    'Z': {'0': '0', '1': '1', '+': '-', '-': '+'},
+    'H': {'0': '+', '1': '-', '+': '0', '-': '1'},
+}
+# Frames between flips of a bubble in superposition (+ <-> -)
+FLIP_FRAMES = FPS * 2
+# Autoplayer: time allowed to plan a shot, and frames of flight in its first batch
+BOT_BUDGET_MS = 4.0
+CHUNK = 8
+
+# Fonts and rendered labels are cached (see text_cache.py)
+text_cache = TextCache("Arial")
 
 def draw_text(text, size, color, x, y):
-    font = pygame.font.SysFont("Arial", size)
-    label = font.render(text, True, color)
-    screen.blit(label, (x, y))
+    text_cache.draw(screen, text, size, color, x, y)
+
+# One pre-rendered sprite per state: the colored bubble with its symbol
+def make_bubble_sprite(state):
+    sprite = pygame.Surface((2 * BUBBLE_RADIUS, 2 * BUBBLE_RADIUS), pygame.SRCALPHA)
+    pygame.draw.circle(sprite, BUBBLE_COLORS[state], (BUBBLE_RADIUS, BUBBLE_RADIUS), BUBBLE_RADIUS)
+    sprite.blit(text_cache.render(state, 24, WHITE), (BUBBLE_RADIUS - 8, BUBBLE_RADIUS - 12))
+    return sprite.convert_alpha()
+
+BUBBLE_SPRITES = {state: make_bubble_sprite(state) for state in STATES}
+
+def draw_bubble(state, x, y):
+    screen.blit(BUBBLE_SPRITES[state], (x - BUBBLE_RADIUS, y - BUBBLE_RADIUS))
 
 class Bubble:
     def __init__(self, row, col, state):
@@ -46,32 +80,20 @@ class Bubble:
         self.x = GRID_LEFT + col * 2 * BUBBLE_RADIUS + BUBBLE_RADIUS
         self.y = GRID_TOP + row * 2 * BUBBLE_RADIUS + BUBBLE_RADIUS
         self.popped = False
-        self.superposition_timer = 0  # For superposition state random flip timer
-
-    def draw(self):
-        if self.popped:
-            return
-        color = BUBBLE_COLORS[self.state]
-        pygame.draw.circle(screen, color, (self.x, self.y), BUBBLE_RADIUS)
-        # Draw state symbol inside bubble
-        draw_text(self.state, 24, WHITE, self.x - 8, self.y - 12)
+        self.flip_due = None  # Frame of the next superposition flip (see BubbleGrid.schedule)
 
-    def update(self):
-        # If superposition, randomly flip between + and - every 2 seconds approx.
-        if self.state in ['+', '-']:
-            self.superposition_timer += 1
-            if self.superposition_timer > FPS * 2:
-                self.superposition_timer = 0
-                # Flip superposition state
-                self.state = '+' if self.state == '-' else '-'
+    def flip(self):
+        # Flip superposition state
+        self.state = '+' if self.state == '-' else '-'
 
 class Cannon:
-    def __init__(self):
+    def __init__(self, rng, speed=8):
+        self.rng = rng
         self.x = WIDTH // 2
         self.y = HEIGHT - 50
         self.angle = 90  # degrees (straight up)
-        self.speed = 8
-        self.bubble_state = random.choice(STATES)
+        self.speed = speed
+        self.bubble_state = self.rng.choice(STATES)
         self.bubble_pos = (self.x, self.y)
         self.is_shooting = False
         self.shoot_x = self.x
@@ -89,8 +111,7 @@ class Cannon:
         pygame.draw.line(screen, BLACK, (self.x, self.y), (end_x, end_y), 6)
         # Draw loaded bubble
         if not self.is_shooting:
-            pygame.draw.circle(screen, BUBBLE_COLORS[self.bubble_state], (self.x, self.y), BUBBLE_RADIUS)
-            draw_text(self.bubble_state, 24, WHITE, self.x - 8, self.y - 12)
+            draw_bubble(self.bubble_state, self.x, self.y)
 
     def aim(self, dir):
         # dir: 'left' or 'right'
@@ -122,78 +143,144 @@ class Cannon:
 
     def draw_shot(self):
         if self.is_shooting:
-            pygame.draw.circle(screen, BUBBLE_COLORS[self.bubble_state], (int(self.shoot_x), int(self.shoot_y)), BUBBLE_RADIUS)
-            draw_text(self.bubble_state, 24, WHITE, int(self.shoot_x) - 8, int(self.shoot_y) - 12)
+            draw_bubble(self.bubble_state, int(self.shoot_x), int(self.shoot_y))
 
     def reset_bubble(self):
-        self.bubble_state = random.choice(STATES)
+        self.bubble_state = self.rng.choice(STATES)
         self.is_shooting = False
         self.shoot_x = self.x
         self.shoot_y = self.y
 
     def apply_gate(self, gate):
         # Apply quantum gate on loaded bubble state before shooting
-        if gate == 'X':
-            # X gate flips |0> <-> |1>, superpositions unchanged
-            if self.bubble_state == '0':
-                self.bubble_state = '1'
-            elif self.bubble_state == '1':
-                self.bubble_state = '0'
-        elif gate == 'Z':
-            # Z gate flips phase of superpositions: + <-> -
-            if self.bubble_state == '+':
-                self.bubble_state = '-'
-            elif self.bubble_state == '-':
-                self.bubble_state = '+'
-        elif gate == 'H':
-            # Hadamard gate switches between basis and superposition
-            if self.bubble_state == '0':
-                self.bubble_state = '+'
-            elif self.bubble_state == '1':
-                self.bubble_state = '-'
-            elif self.bubble_state == '+':
-                self.bubble_state = '0'
-            elif self.bubble_state == '-':
-                self.bubble_state = '1'
+        self.bubble_state = GATES[gate][self.bubble_state]
 
 class BubbleGrid:
-    def __init__(self):
+    def __init__(self, rng, filled_rows=5, rows=ROWS, cols=COLS):
+        self.rng = rng
+        self.rows = rows
+        self.cols = cols
         # Grid is 2D list with either None or Bubble objects
-        self.grid = [[None for _ in range(COLS)] for _ in range(ROWS)]
-        self.populate_initial()
-
-    def populate_initial(self):
-        # Fill first 5 rows with random bubbles (avoiding superpositions for now)
-        for r in range(5):
-            for c in range(COLS):
-                state = random.choice(['0', '1'])
+        self.grid = [[None for _ in range(cols)] for _ in range(rows)]
+        # Groups of adjacent bubbles in the same state, kept up to date on
+        # every change: each cell maps to its group's id, each id to its cells
+        self.group = {}
+        self.members = {}
+        # All visible bubbles pre-composited into one layer, rebuilt only
+        # when a bubble is placed, popped or changes state
+        self.layer = pygame.Surface((min(cols * 2 * BUBBLE_RADIUS, WIDTH - GRID_LEFT),
+                                     min(rows * 2 * BUBBLE_RADIUS, HEIGHT - GRID_TOP)), pygame.SRCALPHA)
+        self.dirty = True
+        # Superposed bubbles flip every FLIP_FRAMES frames. Each is filed in
+        # the wheel slot of the frame it is due, so a frame only looks at the
+        # bubbles flipping in it; popped bubbles are skipped when their slot
+        # comes round
+        self.frame = 0
+        self.wheel = [[] for _ in range(FLIP_FRAMES)]
+        self.populate_initial(filled_rows)
+
+    def populate_initial(self, filled_rows=5):
+        # Fill the first rows with random bubbles (avoiding superpositions for now)
+        for r in range(min(filled_rows, self.rows)):
+            for c in range(self.cols):
+                state = self.rng.choice(['0', '1'])
                 self.grid[r][c] = Bubble(r, c, state)
+                self.join(r, c)
+                self.schedule(self.grid[r][c])
+        self.dirty = True
+
+    def render_layer(self):
+        self.layer.fill((0, 0, 0, 0))
+        size = 2 * BUBBLE_RADIUS
+        rows = self.grid[:self.layer.get_height() // size + 1]
+        cols = self.layer.get_width() // size + 1
+        self.layer.blits([(BUBBLE_SPRITES[bubble.state], (bubble.col * size, bubble.row * size))
+                          for row in rows for bubble in row[:cols] if bubble], doreturn=False)
+        self.dirty = False
 
     def draw(self):
-        for row in self.grid:
-            for bubble in row:
-                if bubble:
-                    bubble.draw()
+        if self.dirty:
+            self.render_layer()
+        screen.blit(self.layer, (GRID_LEFT, GRID_TOP))
 
+    def schedule(self, bubble):
+        if bubble.state in ['+', '-']:
+            bubble.flip_due = self.frame + FLIP_FRAMES
+            self.wheel[bubble.flip_due % FLIP_FRAMES].append(bubble)
+
+    # Advance one frame and flip the superposed bubbles due in it
     def update(self):
-        for row in self.grid:
-            for bubble in row:
-                if bubble:
-                    bubble.update()
+        self.frame += 1
+        slot = self.frame % FLIP_FRAMES
+        due, self.wheel[slot] = self.wheel[slot], []
+        for bubble in due:
+            if bubble.popped or bubble.flip_due != self.frame:
+                continue
+            bubble.flip()
+            self.state_changed(bubble)
+            self.schedule(bubble)
 
     def get_grid_pos(self, x, y):
         # Convert pixel position to grid row,col if inside grid
         col = (x - GRID_LEFT) // (2 * BUBBLE_RADIUS)
         row = (y - GRID_TOP) // (2 * BUBBLE_RADIUS)
-        if 0 <= row < ROWS and 0 <= col < COLS:
+        if 0 <= row < self.rows and 0 <= col < self.cols:
             return int(row), int(col)
         return None, None
 
+    # Fraction t in [0, 1] of the move (x0, y0) -> (x1, y1) at which the shot
+    # first touches a bubble or reaches the top row, or None. Only the cells
+    # within reach of the swept path are tested, so fast shots cannot tunnel
+    # through bubbles and the cost does not depend on the grid size.
+    def sweep(self, x0, y0, x1, y1):
+        reach = 2 * BUBBLE_RADIUS
+        first = None
+        ceiling = CEILING
+        if y1 <= ceiling:
+            first = 0.0 if y0 <= ceiling else (y0 - ceiling) / (y0 - y1)
+        top, left = self.get_grid_pos(max(min(x0, x1) - reach, GRID_LEFT), max(min(y0, y1) - reach, GRID_TOP))
+        bottom, right = self.get_grid_pos(min(max(x0, x1) + reach, GRID_LEFT + self.cols * reach - 1),
+                                          min(max(y0, y1) + reach, GRID_TOP + self.rows * reach - 1))
+        if top is None or bottom is None:
+            return first
+        dx, dy = x1 - x0, y1 - y0
+        a = dx * dx + dy * dy
+        for r in range(top, bottom + 1):
+            for c in range(left, right + 1):
+                b = self.grid[r][c]
+                if not b:
+                    continue
+                fx, fy = x0 - b.x, y0 - b.y
+                outside = fx * fx + fy * fy - reach * reach
+                if outside <= 0:
+                    return 0.0
+                half_b = fx * dx + fy * dy
+                disc = half_b * half_b - a * outside
+                if a == 0 or half_b >= 0 or disc < 0:
+                    continue
+                t = (-half_b - math.sqrt(disc)) / a
+                if t <= 1 and (first is None or t < first):
+                    first = t
+        return first
+
     def can_place(self, row, col):
-        return 0 <= row < ROWS and 0 <= col < COLS and self.grid[row][col] is None
+        return 0 <= row < self.rows and 0 <= col < self.cols and self.grid[row][col] is None
 
     def place_bubble(self, x, y, state):
         # Place bubble in nearest free grid position near x,y
+        cell = self.landing_cell(x, y)
+        if cell is None:
+            return None
+        row, col = cell
+        new_bubble = Bubble(row, col, state)
+        self.grid[row][col] = new_bubble
+        self.join(row, col)
+        self.schedule(new_bubble)
+        self.dirty = True
+        return new_bubble
+
+    # The free cell a bubble stopping at x,y settles in, or None
+    def landing_cell(self, x, y):
         row, col = self.get_grid_pos(x, y)
         if row is None or col is None:
             return None
@@ -206,9 +293,7 @@ class BubbleGrid:
                         row, col = nr, nc
                         break
         if self.can_place(row, col):
-            new_bubble = Bubble(row, col, state)
-            self.grid[row][col] = new_bubble
-            return new_bubble
+            return row, col
         return None
 
     def get_adjacent(self, row, col):
@@ -216,51 +301,317 @@ class BubbleGrid:
         adj = []
         for dr, dc in [(-1,0), (1,0), (0,-1), (0,1)]:
             nr, nc = row + dr, col + dc
-            if 0 <= nr < ROWS and 0 <= nc < COLS and self.grid[nr][nc]:
+            if 0 <= nr < self.rows and 0 <= nc < self.cols and self.grid[nr][nc]:
                 adj.append(self.grid[nr][nc])
         return adj
 
+    # Add the bubble at (row, col) to the group of its same-state neighbours,
+    # merging their groups if it joins several. The smaller group is always
+    # relabelled into the larger, so each bubble moves O(log n) times.
+    def join(self, row, col):
+        cell = (row, col)
+        self.group[cell] = cell
+        self.members[cell] = [cell]
+        state = self.grid[row][col].state
+        for neighbor in self.get_adjacent(row, col):
+            other = (neighbor.row, neighbor.col)
+            if neighbor.state == state and other in self.group:
+                self.merge(self.group[cell], self.group[other])
+
+    def merge(self, a, b):
+        if a == b:
+            return a
+        if len(self.members[a]) < len(self.members[b]):
+            a, b = b, a
+        moved = self.members.pop(b)
+        for cell in moved:
+            self.group[cell] = a
+        self.members[a].extend(moved)
+        return a
+
+    # Take cells out of their groups. A group that loses only some of its
+    # cells may have split, so what is left of it is grouped again; this
+    # costs the size of that group, never the whole grid.
+    def leave(self, cells):
+        gone = set(cells)
+        broken = {self.group.pop(cell) for cell in gone}
+        for gid in broken:
+            rest = [cell for cell in self.members.pop(gid) if cell not in gone]
+            for cell in rest:
+                del self.group[cell]
+            for r, c in rest:
+                self.join(r, c)
+
+    # Regroup a bubble whose state changed
+    def state_changed(self, bubble):
+        self.leave([(bubble.row, bubble.col)])
+        self.join(bubble.row, bubble.col)
+        self.dirty = True
+
     def find_matches(self, bubble):
-        # BFS to find all connected bubbles with the same state
+        # All connected bubbles with the same state: the bubble's group
         if not bubble:
             return []
-        state = bubble.state
-        to_visit = [(bubble.row, bubble.col)]
-        visited = set()
-        matches = []
-        while to_visit:
-            r, c = to_visit.pop()
-            if (r, c) in visited:
-                continue
-            visited.add((r, c))
-            current = self.grid[r][c]
-            if current and current.state == state:
-                matches.append(current)
-                for neighbor in self.get_adjacent(r, c):
-                    if (neighbor.row, neighbor.col) not in visited:
-                        to_visit.append((neighbor.row, neighbor.col))
-        return matches
-
-    def pop_bubbles(self, bubbles):
+        return [self.grid[r][c] for r, c in self.members[self.group[(bubble.row, bubble.col)]]]
+
+    # Bubbles left without a path to the top row once `cells` were emptied.
+    # Anchoring is not maintained incrementally like the groups are: this is
+    # a search, run after every pop, over the clusters next to those cells
+    # (the only ones that can have come loose). Each search heads for the top
+    # row first, so a cluster that is still anchored is usually confirmed in
+    # a few steps, but the worst case costs the size of the affected cluster;
+    # one that runs out of bubbles has visited exactly the floating cluster,
+    # which is then dropped.
+    def floating(self, cells):
+        anchored = set()
+        seen = set()
+        loose = []
+        for row, col in cells:
+            for start in self.get_adjacent(row, col):
+                cell = (start.row, start.col)
+                if cell in seen:
+                    continue
+                visited = {cell}
+                frontier = [cell]
+                reached = False
+                while frontier:
+                    r, c = heapq.heappop(frontier)
+                    if r == 0 or (r, c) in anchored:
+                        reached = True
+                        break
+                    for neighbor in self.get_adjacent(r, c):
+                        other = (neighbor.row, neighbor.col)
+                        if other not in visited:
+                            visited.add(other)
+                            heapq.heappush(frontier, other)
+                seen |= visited
+                if reached:
+                    anchored |= visited
+                else:
+                    loose.extend(self.grid[r][c] for r, c in visited)
+        return loose
+
+    def remove(self, bubbles):
         for bubble in bubbles:
             self.grid[bubble.row][bubble.col] = None
             bubble.popped = True
+        self.leave([(bubble.row, bubble.col) for bubble in bubbles])
+        self.dirty = True
 
-    def collapse_superpositions(self):
-        # If any superposition bubbles remain, randomly flip their states sometimes
-        for row in self.grid:
-            for bubble in row:
-                if bubble and bubble.state in ['+', '-']:
-                    bubble.update()
+    # Pop bubbles, then drop the clusters they leave floating; returns the
+    # dropped bubbles
+    def pop_bubbles(self, bubbles):
+        self.remove(bubbles)
+        dropped = self.floating([(bubble.row, bubble.col) for bubble in bubbles])
+        self.remove(dropped)
+        return dropped
+
+# Picks shots for the cannon, for soak tests and as a CPU opponent.
+#
+# Every reachable angle (10-170 degrees in aiming steps) is flown at once:
+# the path of every shot is stepped once into NumPy arrays, bounces
+# included, and each move is run through the same swept contact test as
+# BubbleGrid.sweep() to find where the shot sticks.
+# The landing cell is then scored for every gate the bot could apply first,
+# by the size of the group the bubble would join (the group find_matches()
+# would return). Shots that pop win over shots that only grow a group; ties
+# go to the one reached in fewer frames.
+class AutoPlayer:
+    def __init__(self, gates=('', 'X', 'Z', 'H'), budget_ms=BOT_BUDGET_MS):
+        self.gates = gates
+        self.budget_ms = budget_ms
+        self.angles = np.arange(10, 171, 2)
+        self.target = None
+        self.plan_ms = 0.0
+        self._paths = None
+
+    # Positions (xs, ys) of every shot after 0, 1, 2... frames, one row per
+    # angle, until all of them are above the grid. They are stepped with the
+    # same float additions and wall clamps as Cannon.shoot() and update(),
+    # one frame at a time: a closed form drifts by an ulp and puts a bounce
+    # a frame early or late when a shot meets a wall exactly. Kept until the
+    # cannon moves or changes speed
+    def paths(self, cannon):
+        key = (cannon.x, cannon.y, cannon.speed)
+        if self._paths is None or self._paths[0] != key:
+            lo, hi = BUBBLE_RADIUS, WIDTH - BUBBLE_RADIUS
+            rad = [math.radians(angle) for angle in self.angles.tolist()]
+            dx = np.array([cannon.speed * math.cos(r) for r in rad])
+            dy = np.array([-cannon.speed * math.sin(r) for r in rad])
+            x = np.full(len(rad), cannon.x, dtype=float)
+            y = np.full(len(rad), cannon.y, dtype=float)
+            xs, ys = [x], [y]
+            while y.max() >= GRID_TOP:
+                x, y = x + dx, y + dy
+                low, high = x < lo, x > hi
+                x[low], x[high] = lo, hi
+                dx = np.where(low | high, -dx, dx)
+                xs.append(x)
+                ys.append(y)
+            self._paths = key, np.array(xs).T, np.array(ys).T
+        return self._paths[1:]
+
+    # Occupancy of the cells a shot on screen can touch, with a margin of
+    # `span` cells all round, so lookups need no bounds checks. Returns the
+    # flattened array, its width and the cell at its origin.
+    def occupancy(self, grid, span):
+        size = 2 * BUBBLE_RADIUS
+        top, left = -GRID_TOP // size - span - 1, -GRID_LEFT // size - span - 1
+        bottom, right = (HEIGHT - GRID_TOP) // size + span + 1, (WIDTH - GRID_LEFT) // size + span + 1
+        occupied = np.zeros((bottom - top, right - left), dtype=bool)
+        rows, cols = min(bottom, grid.rows), min(right, grid.cols)
+        occupied[-top:rows - top, -left:cols - left] = [[b is not None for b in row[:cols]] for row in grid.grid[:rows]]
+        return occupied.ravel(), right - left, (top, left)
+
+    # Fraction of each move (xa, ya) -> (xb, yb) at which the shot first
+    # touches the top row or a bubble, as BubbleGrid.sweep(); inf if none
+    def contact(self, occupancy, xa, ya, xb, yb, span):
+        occupied, width, (top, left) = occupancy
+        size = reach = 2 * BUBBLE_RADIUS
+        ceiling = CEILING
+        t = np.where(yb <= ceiling, np.where(ya <= ceiling, 0.0, (ya - ceiling) / np.where(ya > yb, ya - yb, 1)), np.inf)
+        offsets = (np.arange(-span, span + 1)[:, None] * width + np.arange(-span, span + 1)).ravel()
+        cells = ((((ya - GRID_TOP) // size - top) * width + (xa - GRID_LEFT) // size - left).astype(np.intp)[..., None]
+                 + offsets)
+        near = occupied[cells]
+        if not near.any():
+            return t
+        # Solve |start + s * move - center| = reach for the near bubbles only
+        *move, _ = np.nonzero(near)
+        move = tuple(move)
+        rows, cols = np.divmod(cells[near], width)
+        dx, dy = (xb - xa)[move], (yb - ya)[move]
+        fx = xa[move] - (GRID_LEFT + (cols + left) * size + BUBBLE_RADIUS)
+        fy = ya[move] - (GRID_TOP + (rows + top) * size + BUBBLE_RADIUS)
+        a = dx * dx + dy * dy
+        outside = fx * fx + fy * fy - reach * reach
+        half_b = fx * dx + fy * dy
+        disc = half_b * half_b - a * outside
+        crossing = (a > 0) & (half_b < 0) & (disc >= 0)
+        s = np.full(len(a), np.inf)
+        s[crossing] = (-half_b[crossing] - np.sqrt(disc[crossing])) / a[crossing]
+        s[outside <= 0] = 0.0
+        np.minimum.at(t, move, s)
+        return t
+
+    # Landing cell for each angle, or None for shots that never stick (or
+    # were not resolved within the time budget). All shots are flown
+    # together, starting from the frame each one gets within reach of the
+    # lowest bubble, CHUNK frames at first and twice as many each round, so
+    # steep shots resolve in one small batch and long ones take few rounds
+    def landing_cells(self, cannon, grid, started=None):
+        started = started or perf_counter()
+        size = reach = 2 * BUBBLE_RADIUS
+        n = len(self.angles)
+        vy = -cannon.speed * np.sin(np.radians(self.angles))
+        xs, ys = self.paths(cannon)
+        last = xs.shape[1] - 2  # last frame a move can start on
+        cells = [None] * n
+        # Cells around the start of a move that a bubble touching the move can be in
+        span = int((reach + cannon.speed - BUBBLE_RADIUS) // size) + 1
+        occupancy = self.occupancy(grid, span)
+        filled = [r for r, row in enumerate(grid.grid[:(HEIGHT - GRID_TOP) // size + 1]) if any(row)]
+        lowest = GRID_TOP + (filled[-1] + 1 if filled else 0) * size + reach + cannon.speed
+        frame = np.maximum((cannon.y - lowest) // -vy, 0).astype(np.intp)
+        flying = np.arange(n)
+        chunk = CHUNK
+
+        while len(flying) and not (self.budget_ms and (perf_counter() - started) * 1e3 > self.budget_ms):
+            k = np.minimum(frame[flying, None] + np.arange(chunk), last)
+            shots = flying[:, None]
+            xa, xb = xs[shots, k], xs[shots, k + 1]
+            ya, yb = ys[shots, k], ys[shots, k + 1]
+            t = self.contact(occupancy, xa, ya, xb, yb, span)
+            # Shots that find no free cell where they first touch would fly on
+            # through the grid; they are given up on rather than followed
+            touched = t <= 1
+            hit = touched.any(axis=1)
+            for i, j in zip(np.flatnonzero(hit).tolist(), touched.argmax(axis=1)[hit].tolist()):
+                cells[flying[i]] = grid.landing_cell(xa[i, j] + t[i, j] * (xb[i, j] - xa[i, j]),
+                                                     ya[i, j] + t[i, j] * (yb[i, j] - ya[i, j]))
+            frame[flying] += chunk
+            chunk *= 2
+            # Shots above the grid can no longer stick anywhere
+            flying = flying[~hit & (yb[:, -1] >= GRID_TOP)]
+        return cells
+
+    # Size of the group a bubble in `state` would form at (row, col)
+    def group_size(self, grid, row, col, state):
+        groups = {grid.group[(b.row, b.col)] for b in grid.get_adjacent(row, col) if b.state == state}
+        return 1 + sum(len(grid.members[g]) for g in groups)
+
+    # Best (angle, gate) for the loaded bubble, or None if no shot sticks
+    def plan(self, cannon, grid):
+        started = perf_counter()
+        cells = self.landing_cells(cannon, grid, started)
+        best = None
+        sizes = {}
+        for angle, cell in zip(self.angles.tolist(), cells):
+            if cell is None:
+                continue
+            for gate in self.gates:
+                state = GATES[gate][cannon.bubble_state] if gate else cannon.bubble_state
+                if (cell, state) not in sizes:
+                    sizes[cell, state] = self.group_size(grid, *cell, state)
+                size = sizes[cell, state]
+                frames = abs(angle - cannon.angle) // 2 + (1 if gate else 0)
+                key = (size >= 3, size, -frames)
+                if best is None or key > best[0]:
+                    best = (key, angle, gate)
+        self.plan_ms = (perf_counter() - started) * 1e3
+        return best and best[1:]
+
+    # Drive the cannon for one frame: plan a shot once it is loaded, apply
+    # the gate, then aim one step per frame and shoot
+    def act(self, cannon, grid):
+        if cannon.is_shooting:
+            return
+        if self.target is None:
+            self.target = self.plan(cannon, grid)
+            if self.target is None:
+                return
+            if self.target[1]:
+                cannon.apply_gate(self.target[1])
+        angle = self.target[0]
+        if cannon.angle < angle:
+            cannon.aim('left')
+        elif cannon.angle > angle:
+            cannon.aim('right')
+        else:
+            cannon.shoot()
+            self.target = None
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Quantum Bubble Burst")
+    parser.add_argument("--fill", type=int, default=5,
+                        help="number of grid rows filled at the start (up to --rows)")
+    parser.add_argument("--rows", type=int, default=ROWS, help="grid rows")
+    parser.add_argument("--cols", type=int, default=COLS, help="grid columns")
+    parser.add_argument("--speed", type=float, default=8,
+                        help="distance a shot travels per frame, in pixels")
+    parser.add_argument("--autoplay", action="store_true",
+                        help="let the computer aim and shoot (the keys are ignored)")
+    parser.add_argument("--bot-budget", type=float, default=BOT_BUDGET_MS,
+                        help="milliseconds the computer may spend planning a shot; "
+                             "0 for no limit, which makes runs reproducible")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
     running = True
-    cannon = Cannon()
-    grid = BubbleGrid()
+    # Input, frame pacing and seeded random streams (see session.py)
+    session = Session.from_env("Rescue_v4", [pygame.K_LEFT, pygame.K_RIGHT, pygame.K_SPACE,
+                                             pygame.K_x, pygame.K_z, pygame.K_h], sys.argv[1:])
+    cannon = Cannon(session.rng.spawn, args.speed)
+    grid = BubbleGrid(session.rng.spawn, args.fill, args.rows, args.cols)
+    # Per-phase frame timings, enabled with QE_PROFILE (see frame_timer.py)
+    timer = FrameTimer.from_env("Rescue_v4")
     score = 0
-    font = pygame.font.SysFont("Arial", 24)
+    font = text_cache.font(24)
+    bot = AutoPlayer(budget_ms=args.bot_budget) if args.autoplay else None
 
     while running:
+        timer.start()
         screen.fill(WHITE)
         grid.draw()
         cannon.draw()
@@ -272,12 +623,13 @@ def main():
         draw_text("Arrows: Aim Left/Right | Space: Shoot", 18, BLACK, 10, HEIGHT - 60)
         draw_text("Gates: X, Z, H to change bubble state", 18, BLACK, 10, HEIGHT - 40)
         draw_text(f"Loaded Bubble State: {cannon.bubble_state}", 18, BLACK, 10, HEIGHT - 80)
+        timer.mark("draw")
 
-        for event in pygame.event.get():
+        for event in session.events():
             if event.type == pygame.QUIT:
                 running = False
 
-            if event.type == pygame.KEYDOWN:
+            if event.type == pygame.KEYDOWN and not bot:
                 if event.key == pygame.K_LEFT:
                     cannon.aim('left')
                 elif event.key == pygame.K_RIGHT:
@@ -290,49 +642,45 @@ def main():
                     cannon.apply_gate('Z')
                 elif event.key == pygame.K_h:
                     cannon.apply_gate('H')
+        timer.mark("events")
+        if bot:
+            bot.act(cannon, grid)
+            timer.mark("bot")
 
+        start_x, start_y = cannon.shoot_x, cannon.shoot_y
         cannon.update()
+        timer.mark("movement")
         if cannon.is_shooting:
-            # Check collision with top grid or other bubbles
-            # If y < GRID_TOP + BUBBLE_RADIUS * 2, stick bubble at top row
-            if cannon.shoot_y <= GRID_TOP + BUBBLE_RADIUS * 2:
-                new_bubble = grid.place_bubble(cannon.shoot_x, cannon.shoot_y, cannon.bubble_state)
+            # Stick the shot where its path this frame first touches a bubble
+            # or reaches the top row
+            t = grid.sweep(start_x, start_y, cannon.shoot_x, cannon.shoot_y)
+            if t is not None:
+                hit_x = start_x + t * (cannon.shoot_x - start_x)
+                hit_y = start_y + t * (cannon.shoot_y - start_y)
+                new_bubble = grid.place_bubble(hit_x, hit_y, cannon.bubble_state)
                 if new_bubble:
                     # Check for matches
                     matches = grid.find_matches(new_bubble)
                     if len(matches) >= 3:
-                        grid.pop_bubbles(matches)
-                        score += len(matches)
+                        # Popped bubbles score, and so do the ones they leave
+                        # hanging, which drop
+                        dropped = grid.pop_bubbles(matches)
+                        score += len(matches) + len(dropped)
                     cannon.reset_bubble()
-
-            else:
-                # Check collision with existing bubbles nearby
-                # If close to any bubble (distance < 2*radius), stick there
-                stuck = False
-                for r in range(ROWS):
-                    for c in range(COLS):
-                        b = grid.grid[r][c]
-                        if b:
-                            dist = math.hypot(b.x - cannon.shoot_x, b.y - cannon.shoot_y)
-                            if dist <= 2 * BUBBLE_RADIUS:
-                                new_bubble = grid.place_bubble(cannon.shoot_x, cannon.shoot_y, cannon.bubble_state)
-                                if new_bubble:
-                                    matches = grid.find_matches(new_bubble)
-                                    if len(matches) >= 3:
-                                        grid.pop_bubbles(matches)
-                                        score += len(matches)
-                                    cannon.reset_bubble()
-                                    stuck = True
-                                    break
-                    if stuck:
-                        break
+        timer.mark("collision")
 
         grid.update()
-        grid.collapse_superpositions()
+        timer.mark("update")
+        timer.draw_overlay(screen, font)
 
         pygame.display.flip()
-        CLOCK.tick(FPS)
+        timer.mark("flip")
+        timer.end_frame()
+        session.tick(CLOCK, FPS)
 
+    session.finish(score=score, loaded=cannon.bubble_state,
+                   grid=[''.join(b.state if b else '.' for b in row) for row in grid.grid])
+    timer.export()
     pygame.quit()
 
 if __name__ == "__main__":
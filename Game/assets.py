@@ -0,0 +1,195 @@
+import argparse
+import io
+import mmap
+import os
+import struct
+import warnings
+import zlib
+
+import pygame
+
+# Asset bundle layout (all little-endian):
+#   header   magic, version, entry count
+#   index    one ENTRY per asset: name, width, height, kind, data offset,
+#            length, CRC-32 of the source file it was made from
+#   data     zlib-compressed payloads; images are raw RGB/RGBA pixel rows
+#            already scaled to (width, height), sounds the original file
+MAGIC = b"QEAB"
+VERSION = 2
+HEADER = struct.Struct("<4sHI")
+ENTRY = struct.Struct("<32sHHBQII")
+RGB, RGBA, FILE = 0, 1, 2
+
+ASSET_DIR = "assets"
+BUNDLE = "assets.qab"
+
+# Every image and size the games use, and the sounds; what `build` packs
+TILE = 40
+MANIFEST = {
+    "player.png": [(TILE, TILE)],
+    "wall.png": [(TILE, TILE)],
+    "key.png": [(TILE, TILE)],
+    "exit.png": [(TILE, TILE)],
+    "obstacle.png": [(TILE, TILE)],
+    "check.png": [(TILE, TILE)],
+    "cross.png": [(TILE, TILE)],
+    "spaceship.png": [(60, 40)],
+    "crew.png": [(20, 20)],
+    "hazard.png": [(20, 20)],
+    "intruder.png": [(60, 40)],
+    "bullet.png": [(25, 25)],
+    "powerup.png": [(20, 20)],
+    "background.png": [(800, 600)],
+    "bubble.png": [(40, 40)],
+    "super_bubble.png": [(40, 40)],
+    "rescue.wav": None,
+    "explode.wav": None,
+}
+
+
+# Decode and scale an image from the assets directory, as the games used to
+def load_scaled(path, size=None):
+    image = pygame.image.load(path)
+    return pygame.transform.scale(image, size) if size else image
+
+
+# CRC-32 of a source file, kept in the bundle to notice when it has changed
+def source_crc(path):
+    with open(path, "rb") as f:
+        return zlib.crc32(f.read())
+
+
+def build_bundle(path=BUNDLE, asset_dir=ASSET_DIR, manifest=MANIFEST):
+    entries = []
+    for name, sizes in manifest.items():
+        source = os.path.join(asset_dir, name)
+        crc = source_crc(source)
+        if sizes is None:
+            with open(source, "rb") as f:
+                entries.append((name, 0, 0, FILE, f.read(), crc))
+            continue
+        for size in sizes:
+            image = load_scaled(source, size)
+            kind = RGBA if image.get_flags() & pygame.SRCALPHA else RGB
+            pixels = pygame.image.tobytes(image, "RGBA" if kind == RGBA else "RGB")
+            entries.append((name, *size, kind, pixels, crc))
+
+    offset = HEADER.size + ENTRY.size * len(entries)
+    index, blobs = [], []
+    for name, width, height, kind, data, crc in entries:
+        blob = zlib.compress(data, 9)
+        index.append(ENTRY.pack(name.encode("utf-8"), width, height, kind, offset, len(blob), crc))
+        blobs.append(blob)
+        offset += len(blob)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(entries)))
+        f.writelines(index)
+        f.writelines(blobs)
+
+
+# Images and sounds for a game, from the packed bundle when it has them and
+# from the files in `asset_dir` otherwise.
+#
+# Everything is loaded on first request and cached by (name, size). Images
+# requested while a display mode is set are converted to its pixel format
+# once, so blits never convert per frame; the games call set_mode() before
+# loading theirs. Images loaded with no display stay unconverted.
+#
+# Bundle entries whose source file in `asset_dir` has changed since the
+# bundle was built (by CRC-32) are ignored with a warning, so an edited
+# sprite shows up before the bundle is rebuilt.
+class Assets:
+    def __init__(self, bundle=BUNDLE, asset_dir=ASSET_DIR):
+        self.asset_dir = asset_dir
+        self.cache = {}
+        self.index = {}
+        self._file = self._map = None
+        if bundle and os.path.exists(bundle):
+            self._file = open(bundle, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, count = HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC or version != VERSION:
+                self.close()
+                raise ValueError(f"{bundle} is not a version {VERSION} asset bundle")
+            crcs = {}
+            for i in range(count):
+                name, width, height, kind, offset, length, crc = ENTRY.unpack_from(self._map, HEADER.size + i * ENTRY.size)
+                name = name.rstrip(b"\0").decode("utf-8")
+                size = (width, height) if kind != FILE else None
+                self.index[(name, size)] = (kind, offset, length)
+                crcs[name] = crc
+            if asset_dir:
+                self._drop_stale(bundle, crcs)
+
+    def _drop_stale(self, bundle, crcs):
+        stale = [name for name, crc in crcs.items()
+                 if os.path.exists(os.path.join(self.asset_dir, name))
+                 and source_crc(os.path.join(self.asset_dir, name)) != crc]
+        if not stale:
+            return
+        warnings.warn(f"{bundle} is out of date for {', '.join(stale)}; loading them from "
+                      f"{self.asset_dir} instead (rebuild it with: python assets.py build)")
+        self.index = {key: entry for key, entry in self.index.items() if key[0] not in stale}
+
+    def _data(self, entry):
+        _, offset, length = entry
+        return zlib.decompress(self._map[offset:offset + length])
+
+    def image(self, name, size=None):
+        key = (name, tuple(size) if size else None)
+        image = self.cache.get(key)
+        if image is None:
+            entry = self.index.get(key)
+            if entry is not None:
+                fmt = "RGBA" if entry[0] == RGBA else "RGB"
+                image = pygame.image.frombytes(self._data(entry), key[1], fmt)
+            else:
+                image = load_scaled(os.path.join(self.asset_dir, name), key[1])
+            if pygame.display.get_surface() is not None:
+                alpha = image.get_flags() & pygame.SRCALPHA
+                image = image.convert_alpha() if alpha else image.convert()
+            self.cache[key] = image
+        return image
+
+    def sound(self, name):
+        key = (name, None)
+        sound = self.cache.get(key)
+        if sound is None:
+            entry = self.index.get(key)
+            if entry is not None:
+                sound = pygame.mixer.Sound(file=io.BytesIO(self._data(entry)))
+            else:
+                sound = pygame.mixer.Sound(os.path.join(self.asset_dir, name))
+            self.cache[key] = sound
+        return sound
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect the packed asset bundle.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="pack the assets the games use")
+    build.add_argument("path", nargs="?", default=BUNDLE)
+    build.add_argument("--assets", default=ASSET_DIR, help="directory holding the source files")
+    info = sub.add_parser("info", help="list the contents of a bundle")
+    info.add_argument("path", nargs="?", default=BUNDLE)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_bundle(args.path, args.assets)
+    bundle = Assets(args.path, asset_dir=None)
+    for (name, size), (kind, _, length) in bundle.index.items():
+        shape = "%dx%d %s" % (*size, "RGBA" if kind == RGBA else "RGB") if size else "file"
+        print(f"  {name:<20} {shape:<16} {length:>9} bytes")
+    print(f"{args.path}: {len(bundle.index)} entries, {os.path.getsize(args.path)} bytes")
+    bundle.close()
+
+if __name__ == "__main__":
+    main()
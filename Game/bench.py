@@ -0,0 +1,326 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+# Headless benchmarks for every game loop.
+#
+#   python bench.py                   run all scenarios, compare to the baseline
+#   python bench.py maze Rescue_v2    run scenarios whose name starts with these
+#   python bench.py --update-baseline store this run as the new baseline
+#
+# Each scenario runs in its own process under the SDL dummy drivers, with a
+# fixed seed and scripted input. Game scripts are driven through a generated
+# input recording (see session.py), so they run exactly as in play, without
+# frame pacing. Four numbers are reported per scenario:
+#   ticks/s      1 / median frame time, over the game loop only (the median
+#                keeps one-off stalls from swinging the figure)
+#   ticks/cal    frames run in the time a fixed calibration loop takes in
+#                the same process, timed right after the game loop
+#   alloc KiB/f  mean per-frame high-water of newly allocated memory, from
+#                a second, shorter run under tracemalloc
+#   peak RSS     peak resident memory of the process during the timed run
+#
+# Stress scenarios queue their extra hazards off-screen to the right; they
+# run for few enough frames that the wave never reaches the ship, so every
+# extra entity stays alive for the whole run.
+#
+# Raw ticks/s depends on the machine and on whatever else it is running, so
+# only ticks/cal is compared with the baseline; it stays put when the whole
+# process runs faster or slower. Memory figures are compared as they are.
+GAME_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(GAME_DIR, "bench_baseline.json")
+SEED = 1234
+ALLOC_FRAMES = 20           # frames traced for the allocation figure
+CALIBRATION_STEPS = 200000  # iterations in one calibration loop
+CALIBRATION_TIME = 0.5      # seconds spent timing it
+SETTLE_TIMEOUT = 10.0       # seconds to wait for a game's loading threads
+# Allowed change against the baseline before a run counts as a regression
+TOLERANCE = {"ticks_per_cal": 0.4, "alloc_kib_per_frame": 0.5, "peak_rss_mib": 0.25}
+# Differences smaller than these are noise, whatever the ratio
+SLACK = {"alloc_kib_per_frame": 16.0, "peak_rss_mib": 16.0}
+
+
+# Scripted input: a cycle of (held keys, keys pressed this frame, mouse
+# (buttons, x, y), frames) steps, repeated until `frames` are covered
+def script(game, keys, steps, frames, argv=()):
+    return {"game": game, "keys": keys, "steps": steps, "frames": frames, "argv": list(argv)}
+
+
+def _mask(keys, names):
+    mask = 0
+    for name in names:
+        mask |= 1 << keys.index(name)
+    return mask
+
+
+def write_recording(path, spec):
+    import session
+    runs = []
+    left = spec["frames"]
+    while left > 0:
+        for held, down, (buttons, x, y), count in spec["steps"]:
+            count = min(count, left)
+            runs.append((_mask(spec["keys"], held), _mask(spec["keys"], down), buttons, x, y, count))
+            left -= count
+            if not left:
+                break
+    session.save_recording(path, {"game": spec["game"], "seed": SEED, "argv": spec["argv"],
+                                  "keys": spec["keys"], "result": None}, runs)
+
+
+NO_MOUSE = (0, 0, 0)
+RESCUE_KEYS = ["up", "down", "left", "right", "x", "z", "h", "space"]
+RESCUE_STEPS = [(("up",), (), NO_MOUSE, 12), (("down", "space"), (), NO_MOUSE, 12),
+                (("right",), (), NO_MOUSE, 4), (("left", "space"), (), NO_MOUSE, 4)]
+V3_KEYS = ["up", "down", "x", "z", "h"]
+V3_STEPS = [(("up",), (), NO_MOUSE, 10), ((), (), NO_MOUSE, 10), (("down",), (), NO_MOUSE, 10)]
+V4_KEYS = ["left", "right", "space", "x", "z", "h"]
+V4_STEPS = [((), ("left",), NO_MOUSE, 1), ((), (), NO_MOUSE, 5), ((), ("space",), NO_MOUSE, 1),
+            ((), (), NO_MOUSE, 40), ((), ("right",), NO_MOUSE, 1), ((), ("right",), NO_MOUSE, 1),
+            ((), ("h",), NO_MOUSE, 1), ((), ("space",), NO_MOUSE, 1), ((), (), NO_MOUSE, 40)]
+BUBBLE_KEYS = ["q", "x", "z"]
+BUBBLE_STEPS = [((), (), (9, 300, 200), 2), ((), (), (8, 300, 200), 20), (("q",), (), (8, 0, 0), 1),
+                ((), (), (9, 520, 380), 2), ((), (), (8, 520, 380), 20), (("x",), (), (8, 0, 0), 1)]
+MAZE_KEYS = ["left", "right", "up", "down", "x", "z", "h", "tab"]
+MAZE_STEPS = [((), (), NO_MOUSE, 20), (("tab",), (), NO_MOUSE, 10)]
+
+SCENARIOS = {
+    "maze": script("maze", MAZE_KEYS, MAZE_STEPS, 600, ["--seed", "10"]),
+    "maze_obstacles_10": {"engine": "obstacles", "count": 10, "frames": 300},
+    "maze_obstacles_1k": {"engine": "obstacles", "count": 1000, "frames": 300},
+    "maze_obstacles_100k": {"engine": "obstacles", "count": 100000, "frames": 60},
+    "maze_large_512": {"engine": "large", "size": 512, "frames": 500},
+    "Rescue": script("Rescue", ["up", "down", "x", "z", "h"], V3_STEPS, 1200),
+    "Rescue_soak": script("Rescue", ["up", "down", "x", "z", "h"], V3_STEPS, 30000),
+    "Rescue_crew_1k": script("Rescue", ["up", "down", "x", "z", "h"], V3_STEPS, 60, ["--crew", "1000"]),
+    "Rescue_v2": script("Rescue_v2", RESCUE_KEYS, RESCUE_STEPS, 1200),
+    "Rescue_v2_hazards_10": script("Rescue_v2", RESCUE_KEYS, RESCUE_STEPS, 60, ["--hazards", "10"]),
+    "Rescue_v2_hazards_1k": script("Rescue_v2", RESCUE_KEYS, RESCUE_STEPS, 60, ["--hazards", "1000"]),
+    "Rescue_v2_hazards_100k": script("Rescue_v2", RESCUE_KEYS, RESCUE_STEPS, 30, ["--hazards", "100000"]),
+    "Rescue_v3": script("Rescue_v3", V3_KEYS, V3_STEPS, 1200),
+    "Rescue_v3_hazards_10": script("Rescue_v3", V3_KEYS, V3_STEPS, 60, ["--hazards", "10"]),
+    "Rescue_v3_hazards_1k": script("Rescue_v3", V3_KEYS, V3_STEPS, 60, ["--hazards", "1000"]),
+    "Rescue_v3_hazards_100k": script("Rescue_v3", V3_KEYS, V3_STEPS, 30, ["--hazards", "100000"]),
+    "Rescue_v4": script("Rescue_v4", V4_KEYS, V4_STEPS, 600),
+    "Rescue_v4_full_grid": script("Rescue_v4", V4_KEYS, V4_STEPS, 600, ["--fill", "10"]),
+    "Rescue_v4_fast_shot": script("Rescue_v4", V4_KEYS, V4_STEPS, 600, ["--speed", "90"]),
+    "Rescue_v4_autoplay": script("Rescue_v4", V4_KEYS, V4_STEPS, 1200, ["--autoplay", "--bot-budget", "0"]),
+    "Rescue_v4_board_200": script("Rescue_v4", V4_KEYS, V4_STEPS, 300, ["--rows", "200", "--cols", "200", "--fill", "12"]),
+    "bubbleTrobble": script("bubbleTrobble", BUBBLE_KEYS, BUBBLE_STEPS, 1200),
+    "bubbleTrobble_bubbles_1k": script("bubbleTrobble", BUBBLE_KEYS, BUBBLE_STEPS, 300, ["--bubbles", "1000"]),
+    "bubbleTrobble_bubbles_10k": script("bubbleTrobble", BUBBLE_KEYS, BUBBLE_STEPS, 30, ["--bubbles", "10000"]),
+}
+
+
+# Game scripts: replay the scripted input, `hook` runs after every frame
+def run_script(spec, frames, hook):
+    import session
+    import replay
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "input.qer")
+        write_recording(path, dict(spec, frames=frames))
+        session.frame_hooks[:] = [lambda s: hook()]
+        try:
+            replay.replay(path)
+        finally:
+            session.frame_hooks.clear()
+
+
+# Maze stress level: many scattered obstacles, drawn by the game's renderer.
+# Deaths are ignored so every frame moves and draws the full field.
+def run_obstacles(spec, frames, hook):
+    import numpy as np
+    sys.argv = ["maze.py"]
+    import maze
+    from maze_engine import MazeEngine, RUNNING
+    engine = MazeEngine(maze.HEIGHT // 2 // maze.TILE, maze.WIDTH // maze.TILE, seed=SEED)
+    engine.obstacles.scatter(spec["count"], np.random.default_rng(SEED))
+    maze.init_display()
+    renderer = maze.MazeRenderer(engine)
+    for _ in range(frames):
+        engine.step()
+        engine.status = RUNNING
+        renderer.draw()
+        renderer.present()
+        hook()
+
+
+# Large generated maze, headless: a bot following the engine's hints
+def run_large(spec, frames, hook):
+    from maze_engine import MazeEngine, RUNNING
+    size = spec["size"]
+    engine = MazeEngine(size, size, seed=SEED)
+    engine.obstacles.clear()
+    for _ in range(frames):
+        action = engine.hint()
+        engine.step({action} if action else ())
+        if engine.status != RUNNING:
+            engine.reset()
+            engine.obstacles.clear()
+        hook()
+
+
+def run_scenario(spec, frames, hook):
+    kind = spec.get("engine")
+    if kind == "obstacles":
+        run_obstacles(spec, frames, hook)
+    elif kind == "large":
+        run_large(spec, frames, hook)
+    else:
+        run_script(spec, frames, hook)
+
+
+# Wait for background threads a game started while loading (sound
+# prefetch), so their allocations aren't counted against later frames
+def settle():
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread():
+            thread.join(SETTLE_TIMEOUT)
+
+
+def _spin(steps):
+    total = 0
+    table = {}
+    for i in range(steps):
+        table[i & 1023] = total
+        total += i * 3 % 7
+    return total
+
+
+# Time of one calibration loop, a fixed pure-Python workload. It is timed in
+# rounds about as long as `frame` seconds, taking the median as for frames,
+# so the scheduler interrupts the rounds about as often as the frames.
+def calibrate(frame):
+    probes = []
+    for _ in range(3):
+        start = time.perf_counter()
+        _spin(1000)
+        probes.append(time.perf_counter() - start)
+    steps = max(int(1000 * frame / min(probes)), 100)
+    times = []
+    deadline = time.perf_counter() + CALIBRATION_TIME
+    while len(times) < 9 or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        _spin(steps)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2] * CALIBRATION_STEPS / steps
+
+
+# Measure one scenario in this process
+def measure(name):
+    spec = SCENARIOS[name]
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    os.chdir(GAME_DIR)
+    if GAME_DIR not in sys.path:
+        sys.path.insert(0, GAME_DIR)
+
+    stamps = []
+    run_scenario(spec, spec["frames"], lambda: stamps.append(time.perf_counter()))
+    deltas = sorted(b - a for a, b in zip(stamps, stamps[1:]))
+    median = deltas[len(deltas) // 2] if deltas else 0.0
+    calibration = calibrate(median)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    # Allocation pass: per frame, how far traced memory rose above its level
+    # at the start of the frame
+    highs = []
+    def trace():
+        if not highs:
+            settle()
+        current, peak = tracemalloc.get_traced_memory()
+        highs.append(peak - trace.start)
+        tracemalloc.reset_peak()
+        trace.start = current
+    tracemalloc.start()
+    trace.start = tracemalloc.get_traced_memory()[0]
+    run_scenario(spec, min(spec["frames"], ALLOC_FRAMES), trace)
+    tracemalloc.stop()
+    # The first frame includes setup after the game's module code ran, and
+    # whatever its loading threads (sound prefetch) allocated
+    highs = highs[1:] or highs
+
+    return {
+        "frames": len(stamps),
+        "ticks_per_s": 1 / median if median else 0.0,
+        "ticks_per_cal": calibration / median if median else 0.0,
+        "alloc_kib_per_frame": sum(highs) / len(highs) / 1024 if highs else 0.0,
+        "peak_rss_mib": peak_rss,
+    }
+
+
+# Problems with `result` against `base`, as printable strings
+def regressions(result, base):
+    problems = []
+    if result["ticks_per_cal"] < base["ticks_per_cal"] * (1 - TOLERANCE["ticks_per_cal"]):
+        problems.append(f"ticks/cal {result['ticks_per_cal']:.2f} < baseline {base['ticks_per_cal']:.2f}")
+    for key in ("alloc_kib_per_frame", "peak_rss_mib"):
+        limit = max(base[key] * (1 + TOLERANCE[key]), base[key] + SLACK[key])
+        if result[key] > limit:
+            problems.append(f"{key} {result[key]:.1f} > baseline {base[key]:.1f}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmarks for the Quantum Escape games")
+    parser.add_argument("scenarios", nargs="*", help="name prefixes of the scenarios to run (default: all)")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline file to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="write this run to the baseline file")
+    parser.add_argument("--list", action="store_true", help="list the scenarios and exit")
+    parser.add_argument("--one", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one:
+        print(json.dumps(measure(args.one)))
+        return
+    if args.list:
+        print("\n".join(SCENARIOS))
+        return
+
+    names = [name for name in SCENARIOS
+             if not args.scenarios or any(name.startswith(prefix) for prefix in args.scenarios)]
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    failed = []
+    print(f"{'scenario':<28}{'frames':>7}{'ticks/s':>11}{'ticks/cal':>11}{'alloc KiB/f':>13}{'peak RSS MiB':>14}")
+    for name in names:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--one", name],
+                             capture_output=True, text=True)
+        if out.returncode:
+            print(f"{name:<28} FAILED TO RUN\n{out.stderr}")
+            failed.append(name)
+            continue
+        result = results[name] = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{name:<28}{result['frames']:>7}{result['ticks_per_s']:>11.1f}{result['ticks_per_cal']:>11.2f}"
+              f"{result['alloc_kib_per_frame']:>13.1f}{result['peak_rss_mib']:>14.1f}")
+        if name in baseline and not args.update_baseline:
+            for problem in regressions(result, baseline[name]):
+                print(f"  REGRESSION: {problem}")
+                failed.append(name)
+
+    if args.update_baseline:
+        # Raw ticks/s only means something on the machine that measured it
+        baseline.update({name: {key: value for key, value in result.items() if key != "ticks_per_s"}
+                         for name, result in results.items()})
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"baseline written to {args.baseline}")
+    if failed:
+        print(f"\n{len(set(failed))} scenario(s) regressed or failed: {', '.join(sorted(set(failed)))}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
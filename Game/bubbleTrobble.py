@@ -1,11 +1,21 @@
+import argparse
 import pygame
-import random
-import os
+import sys
+import numpy as np
+from session import Session
+from assets import Assets
+from sounds import SoundService
 
 # Constants
 WIDTH, HEIGHT = 800, 600
 FPS = 60
 
+# Command line
+parser = argparse.ArgumentParser(description="Quantum Bubble Burst")
+parser.add_argument("--bubbles", type=int, default=0,
+                    help="start with this many bubbles on screen (stress test)")
+args = parser.parse_args()
+
 # Quantum States
 CLASSICAL_STATES = ["|0>", "|1>"]
 SUPERPOSITION_STATES = ["|+>", "|->"]
@@ -17,125 +27,185 @@ pygame.display.set_caption("Quantum Bubble Burst")
 clock = pygame.time.Clock()
 font = pygame.font.SysFont("Arial", 24)
 
-# Load assets
-background_img = pygame.image.load(os.path.join("assets", "background.png"))
-background_img = pygame.transform.scale(background_img, (WIDTH, HEIGHT))
-
-bubble_img = pygame.image.load(os.path.join("assets", "bubble.png"))
-bubble_img = pygame.transform.scale(bubble_img, (40, 40))
-
-super_bubble_img = pygame.image.load(os.path.join("assets", "super_bubble.png"))
-super_bubble_img = pygame.transform.scale(super_bubble_img, (40, 40))
-
-burst_sound = pygame.mixer.Sound(os.path.join("assets", "rescue.wav"))
-
-# Bubble class
-class Bubble:
-    def __init__(self, x, y, state):
-        self.rect = pygame.Rect(x, y, 40, 40)
-        self.state = state
-        self.superposition = state in SUPERPOSITION_STATES
+# Input, frame pacing and seeded random streams (see session.py)
+session = Session.from_env("bubbleTrobble", [pygame.K_q, pygame.K_x, pygame.K_z], sys.argv[1:])
+spawn_rng = session.rng.spawn
+
+# Load assets (pre-scaled and display-converted, see assets.py)
+assets = Assets()
+
+background_img = assets.image("background.png", (WIDTH, HEIGHT))
+
+bubble_img = assets.image("bubble.png", (40, 40))
+
+super_bubble_img = assets.image("super_bubble.png", (40, 40))
+
+# Sounds: one burst sound per frame at most (see sounds.py)
+sounds = SoundService(assets)
+sounds.add("burst", "rescue.wav", min_gap=6)
+sounds.prefetch()
+
+# Bubble states as small integers, and each gate as a lookup table
+# mapping old state -> new state
+STATE_NAMES = CLASSICAL_STATES + SUPERPOSITION_STATES   # |0>, |1>, |+>, |->
+SUPERPOSED = 2                                           # states >= this are |+>/|->
+GATE_TABLES = {
+    "H": np.array([2, 3, 0, 1], dtype=np.int8),
+    "X": np.array([1, 0, 2, 3], dtype=np.int8),
+    "Z": np.array([0, 1, 3, 2], dtype=np.int8),
+}
+BUBBLE_SIZE = 40
+CHAIN_REACH = BUBBLE_SIZE // 2 + 30 + BUBBLE_SIZE // 2   # rect.inflate(60, 60) overlap
+
+# All bubbles as parallel arrays (top-left position and state), so a gate or
+# a collapse updates every bubble in one array operation. Collapses draw
+# their outcomes from `rng`, a NumPy generator
+class BubbleStore:
+    def __init__(self, rng, capacity=64):
+        self.rng = rng
+        self.count = 0
+        self.x = np.zeros(capacity, dtype=np.int32)
+        self.y = np.zeros(capacity, dtype=np.int32)
+        self.state = np.zeros(capacity, dtype=np.int8)
+
+    def __len__(self):
+        return self.count
+
+    def add(self, x, y, state):
+        x, y, state = np.atleast_1d(x), np.atleast_1d(y), np.atleast_1d(state)
+        end = self.count + len(x)
+        if end > len(self.x):
+            capacity = max(end, 2 * len(self.x))
+            for name in ("x", "y", "state"):
+                grown = np.zeros(capacity, dtype=getattr(self, name).dtype)
+                grown[:self.count] = getattr(self, name)[:self.count]
+                setattr(self, name, grown)
+        self.x[self.count:end] = x
+        self.y[self.count:end] = y
+        self.state[self.count:end] = state
+        self.count = end
+
+    # Drop every bubble where `mask` is set, keeping the others in order
+    def remove(self, mask):
+        keep = ~mask
+        n = int(keep.sum())
+        for name in ("x", "y", "state"):
+            values = getattr(self, name)
+            values[:n] = values[:self.count][keep]
+        self.count = n
+
+    def states(self):
+        return self.state[:self.count]
+
+    def superposed(self):
+        return self.states() >= SUPERPOSED
+
+    def apply_gate(self, gate):
+        states = self.states()
+        states[:] = GATE_TABLES[gate][states]
+
+    # Randomly collapse the masked bubbles to |0> or |1>
+    def collapse(self, mask):
+        self.states()[mask] = self.rng.integers(0, 2, int(mask.sum()), dtype=np.int8)
+
+    def at_point(self, px, py):
+        x, y = self.x[:self.count], self.y[:self.count]
+        return (x <= px) & (px < x + BUBBLE_SIZE) & (y <= py) & (py < y + BUBBLE_SIZE)
+
+    # Bubbles whose rect touches the inflated rect of any of the `centers` bubbles
+    def near(self, centers):
+        x, y = self.x[:self.count], self.y[:self.count]
+        cx, cy = x[centers], y[centers]
+        close = (np.abs(x[:, None] - cx) < CHAIN_REACH) & (np.abs(y[:, None] - cy) < CHAIN_REACH)
+        return close.any(axis=1)
 
     def draw(self, screen):
-        if self.superposition:
-            screen.blit(super_bubble_img, self.rect)
-        else:
-            screen.blit(bubble_img, self.rect)
-
-    def collapse(self):
-        # Randomly collapse to |0> or |1>
-        outcome = random.choice(CLASSICAL_STATES)
-        self.state = outcome
-        self.superposition = False
+        sup = self.superposed()
+        screen.blits([(super_bubble_img if s else bubble_img, pos)
+                      for s, pos in zip(sup.tolist(), zip(self.x[:self.count].tolist(), self.y[:self.count].tolist()))],
+                     doreturn=False)
 
 # Game variables
-bubbles = []
+rng = session.rng.generator("collapse")
+bubbles = BubbleStore(rng)
 score = 0
 message = ""
 message_timer = 0
 
-# Gate control
-def apply_gate(bubble, gate):
-    if gate == "H":
-        if bubble.state in CLASSICAL_STATES:
-            bubble.state = "|+>" if bubble.state == "|0>" else "|->"
-            bubble.superposition = True
-        elif bubble.state in SUPERPOSITION_STATES:
-            bubble.state = "|0>" if bubble.state == "|+>" else "|1>"
-            bubble.superposition = False
-    elif gate == "X":
-        if bubble.state in CLASSICAL_STATES:
-            bubble.state = "|1>" if bubble.state == "|0>" else "|0>"
-    elif gate == "Z":
-        if bubble.state == "|+>":
-            bubble.state = "|->"
-        elif bubble.state == "|->":
-            bubble.state = "|+>"
-
 # Bubble spawning
 SPAWN_INTERVAL = 60
 spawn_timer = 0
+for _ in range(args.bubbles):
+    x = spawn_rng.randint(0, WIDTH - 40)
+    y = spawn_rng.randint(0, HEIGHT - 40)
+    bubbles.add(x, y, spawn_rng.randrange(len(STATE_NAMES)))
 
 # Main loop
 running = True
 while running:
     screen.blit(background_img, (0, 0))
 
-    for event in pygame.event.get():
+    for event in session.events():
         if event.type == pygame.QUIT:
             running = False
 
-    # Handle input
-    keys = pygame.key.get_pressed()
+    # Handle input: each gate updates every bubble at once
+    keys = session.pressed()
     if keys[pygame.K_q]:  # Apply Hadamard to all bubbles
-        for b in bubbles:
-            apply_gate(b, "H")
+        bubbles.apply_gate("H")
     if keys[pygame.K_x]:
-        for b in bubbles:
-            apply_gate(b, "X")
+        bubbles.apply_gate("X")
     if keys[pygame.K_z]:
-        for b in bubbles:
-            apply_gate(b, "Z")
+        bubbles.apply_gate("Z")
 
     # Mouse click = burst bubble
-    if pygame.mouse.get_pressed()[0]:
-        mx, my = pygame.mouse.get_pos()
-        for b in bubbles[:]:
-            if b.rect.collidepoint(mx, my):
-                if b.superposition:
-                    b.collapse()
-                    if random.choice([True, False]):
-                        burst_sound.play()
-                        bubbles.remove(b)
-                        score += 10
-                        message = "Quantum collapse: Bubble burst!"
-                        message_timer = 60
-                else:
-                    burst_sound.play()
-                    bubbles.remove(b)
-                    score += 10
-                    message = "Bubble burst!"
-                    message_timer = 60
-                    # Chain reaction: burst neighbors
-                    for nb in bubbles[:]:
-                        if nb.rect.colliderect(b.rect.inflate(60, 60)) and nb != b:
-                            if not nb.superposition:
-                                bubbles.remove(nb)
-                                burst_sound.play()
-                                score += 5
+    buttons, (mx, my) = session.mouse()
+    if buttons[0] and len(bubbles):
+        hit = bubbles.at_point(mx, my)
+        superposed = bubbles.superposed()
+        burst = hit & ~superposed
+
+        # Superposed bubbles collapse, and half of them burst
+        quantum = hit & superposed
+        if quantum.any():
+            bubbles.collapse(quantum)
+            lucky = quantum.copy()
+            lucky[quantum] = rng.random(int(quantum.sum())) < 0.5
+            if lucky.any():
+                score += 10 * int(lucky.sum())
+                message = "Quantum collapse: Bubble burst!"
+                message_timer = 60
+                sounds.play("burst")
+        else:
+            lucky = np.zeros_like(hit)
+
+        if burst.any():
+            score += 10 * int(burst.sum())
+            message = "Bubble burst!"
+            message_timer = 60
+            sounds.play("burst")
+            # Chain reaction: burst classical neighbours. Hit bubbles that
+            # collapsed and stayed count as classical if they come before a
+            # burst bubble in the list, as when bubbles were handled one by
+            # one (every hit bubble covers the click, so all are in reach)
+            chain = bubbles.near(np.flatnonzero(burst)) & ~superposed & ~burst
+            stayed = quantum & ~lucky
+            stayed[np.flatnonzero(burst)[-1]:] = False
+            chain |= stayed
+            score += 5 * int(chain.sum())
+            burst |= chain
+        bubbles.remove(burst | lucky)
 
     # Spawn new bubbles
     spawn_timer += 1
     if spawn_timer >= SPAWN_INTERVAL:
-        x = random.randint(0, WIDTH - 40)
-        y = random.randint(0, HEIGHT - 40)
-        state = random.choice(CLASSICAL_STATES + SUPERPOSITION_STATES)
-        bubbles.append(Bubble(x, y, state))
+        x = spawn_rng.randint(0, WIDTH - 40)
+        y = spawn_rng.randint(0, HEIGHT - 40)
+        bubbles.add(x, y, spawn_rng.randrange(len(STATE_NAMES)))
         spawn_timer = 0
 
     # Draw bubbles
-    for b in bubbles:
-        b.draw(screen)
+    bubbles.draw(screen)
 
     # Display score
     score_text = font.render(f"Score: {score}", True, (255, 255, 255))
@@ -147,7 +217,9 @@ while running:
         screen.blit(msg_text, (WIDTH // 2 - msg_text.get_width() // 2, HEIGHT // 2))
         message_timer -= 1
 
+    sounds.update()
     pygame.display.flip()
-    clock.tick(FPS)
+    session.tick(clock, FPS)
 
+session.finish(score=score, bubbles=len(bubbles), states=bubbles.states().tolist())
 pygame.quit()
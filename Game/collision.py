@@ -0,0 +1,112 @@
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from entity_store import X, W, H
+
+CELL_SIZE = 64  # width of a ColumnIndex column
+
+
+# Contact search between named groups of pygame.Rects.
+#
+#   groups: {"ship": [ship], "rocket": rockets, "intruder": intruders, ...}
+#   pairs:  [("ship", "hazard"), ("rocket", "intruder"), ...]
+#
+# A lone rect on the left (the ship) is tested against its targets with one
+# Rect.collidelistall() call. Several rects are first narrowed to the
+# targets touching their bounding box, also in one call, so off-screen
+# stress hazards cost nothing further; those are sorted by left edge and
+# each left-hand rect only tests the x-slice it can reach, found by
+# bisection. Rects are tested as stored, without copies. Returns
+# {(a, b): [(i, j), ...]} with indices into groups[a] and groups[b], in
+# ascending order of i, then j.
+def find_contacts(groups, pairs):
+    contacts = {}
+    for a, b in pairs:
+        found = contacts[(a, b)] = []
+        movers = list(groups[a])
+        targets = groups[b]
+        if not movers or not targets:
+            continue
+        if len(movers) == 1:
+            found.extend((0, j) for j in movers[0].collidelistall(targets))
+            continue
+        near = movers[0].unionall(movers[1:]).collidelistall(targets)
+        if not near:
+            continue
+        near.sort(key=lambda j: targets[j].left)
+        rects = [targets[j] for j in near]
+        lefts = [rect.left for rect in rects]
+        reach = max(rect.width for rect in rects)
+        for i, rect in enumerate(movers):
+            lo = bisect_right(lefts, rect.left - reach)
+            hi = bisect_left(lefts, rect.right)
+            if lo < hi:
+                found.extend((i, near[lo + k]) for k in rect.collidelistall(rects[lo:hi]))
+        found.sort()
+    return contacts
+
+
+# Broad phase for the NumPy entity kinds of entity_store.py, rebuilt once
+# per frame after they move.
+#
+# The on-screen entities are bucketed by the CELL_SIZE-wide screen column
+# their left edge is in and sorted by column, which makes every column one
+# contiguous slice of `order`. A query takes any number of rects (e.g. a
+# ship and all its twins) and tests them together against just the columns
+# they reach, widened on the left by the widest entity, rather than
+# scanning every kind once per rect. Hits are (kind, slot) pairs, slot being the entity's index
+# in that kind until it is next culled.
+class ColumnIndex:
+    def __init__(self, kinds, width, cell_size=CELL_SIZE):
+        self.kinds = kinds
+        self.width = width
+        self.cell_size = cell_size
+        self.columns = -(-width // cell_size)
+        self.starts = np.zeros(self.columns + 1, dtype=np.intp)
+        self.build()
+
+    def build(self):
+        boxes, slots, self.offsets = [], [], []
+        total = 0
+        for kind in self.kinds:
+            self.offsets.append(total)
+            if not kind.count:
+                continue
+            live = kind.data[:, :kind.count]
+            on = np.flatnonzero((live[X] < self.width) & (live[X] + live[W] > 0))
+            boxes.append(live[X:H + 1, on])
+            slots.append(on)
+            total += len(on)
+        if not total:
+            self.count = 0
+            return
+        self.count = total
+        self.boxes = np.concatenate(boxes, axis=1)
+        self.slots = np.concatenate(slots)
+        self.reach = int(self.boxes[W].max())
+        # int16 column keys make the stable argsort a radix sort
+        column = (np.maximum(self.boxes[X], 0) // self.cell_size).astype(np.int16)
+        self.order = np.argsort(column, kind="stable")
+        np.cumsum(np.bincount(column, minlength=self.columns), out=self.starts[1:])
+
+    # Hits for each of `rects`, as one list per rect
+    def query(self, rects):
+        hits = [[] for _ in rects]
+        if not rects or not self.count:
+            return hits
+        lo = min(max((min(r.left for r in rects) - self.reach) // self.cell_size, 0), self.columns)
+        hi = min(max((max(r.right for r in rects) - 1) // self.cell_size + 1, 0), self.columns)
+        near = self.order[self.starts[lo]:self.starts[hi]]
+        if not len(near):
+            return hits
+        left, top, right, bottom = np.array([(r.left, r.top, r.right, r.bottom) for r in rects]).T[:, :, None]
+        x, y, w, h = self.boxes[:, near]
+        hit = (x < right) & (x + w > left) & (y < bottom) & (y + h > top)
+        if not hit.any():
+            return hits
+        for found, ship in zip(hit, hits):
+            found = near[found]
+            owners = np.searchsorted(self.offsets, found, side="right") - 1
+            ship.extend((self.kinds[k], s) for k, s in zip(owners.tolist(), self.slots[found].tolist()))
+        return hits
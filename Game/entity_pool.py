@@ -0,0 +1,37 @@
+# A fixed number of preallocated entities, recycled through a free list.
+#
+# acquire() hands out a free entity (None when all are in use) and cull()
+# returns the ones that are done to the free list, once per frame, so nothing
+# is allocated or left behind while the game runs. Iterating the pool visits
+# the live entities only, in the order they were acquired.
+class EntityPool:
+    def __init__(self, capacity, make):
+        self.capacity = capacity
+        self.free = [make() for _ in range(capacity)]
+        self.active = []
+
+    def acquire(self):
+        if not self.free:
+            return None
+        entity = self.free.pop()
+        self.active.append(entity)
+        return entity
+
+    # Keep the live entities for which keep(entity) is true, free the rest.
+    # Compacts in place, keeping the order, so culling allocates nothing
+    def cull(self, keep):
+        active = self.active
+        live = 0
+        for entity in active:
+            if keep(entity):
+                active[live] = entity
+                live += 1
+            else:
+                self.free.append(entity)
+        del active[live:]
+
+    def __iter__(self):
+        return iter(self.active)
+
+    def __len__(self):
+        return len(self.active)
@@ -0,0 +1,127 @@
+import numpy as np
+
+# Rows of EntityKind.data
+X, Y, W, H, VX, VY, TAG = range(7)
+
+CHUNK = 1024  # positions converted to Python ints at a time
+
+
+# Scrolling objects of one kind as NumPy columns.
+#
+# Position, size and velocity (plus a free integer `tag`, e.g. a state
+# index) are rows of one int32 array with the live entities packed at the
+# front; it doubles in size when full. Spawning a batch, moving and culling
+# are each a single whole-array operation however many entities there are,
+# and renderers read positions straight from the x and y columns.
+class EntityKind:
+    def __init__(self, name, size, velocity, capacity=64):
+        self.name = name
+        self.size = size
+        self.velocity = velocity
+        self.count = 0
+        self.data = np.zeros((7, capacity), dtype=np.int32)
+
+    # Live views of the columns
+    @property
+    def x(self):
+        return self.data[X, :self.count]
+
+    @property
+    def y(self):
+        return self.data[Y, :self.count]
+
+    @property
+    def tag(self):
+        return self.data[TAG, :self.count]
+
+    def __len__(self):
+        return self.count
+
+    # Add entities at (x, y); scalars or equal-length arrays
+    def spawn(self, x, y, tag=0):
+        x = np.atleast_1d(x)
+        n = len(x)
+        if self.count + n > self.data.shape[1]:
+            grown = np.zeros((7, max(2 * self.data.shape[1], self.count + n)), dtype=np.int32)
+            grown[:, :self.count] = self.data[:, :self.count]
+            self.data = grown
+        self.data[:, self.count:self.count + n] = np.array(
+            [x, np.broadcast_to(y, n), np.full(n, self.size[0]), np.full(n, self.size[1]),
+             np.full(n, self.velocity[0]), np.full(n, self.velocity[1]), np.broadcast_to(tag, n)])
+        self.count += n
+
+    def move(self):
+        if not self.count:
+            return
+        live = self.data[:, :self.count]
+        live[X:Y + 1] += live[VX:VY + 1]
+
+    # Shift everything vertically by dy, wrapping round the screen edges
+    def scroll(self, dy, height):
+        if not self.count:
+            return
+        live = self.data[:, :self.count]
+        live[Y] += dy
+        if dy < 0:
+            wrap = live[Y] < 0
+            live[Y, wrap] = height - live[H, wrap]
+        else:
+            live[Y, live[Y] > height - live[H]] = 0
+
+    # Drop the entities that scrolled past the screen edge the kind moves
+    # towards. Survivors from the end fill the holes, so only the culled few
+    # are copied rather than the whole array
+    def cull(self, width):
+        if not self.count:
+            return
+        live = self.data[:, :self.count]
+        if self.velocity[0] < 0:
+            gone = live[X] + live[W] <= 0
+        else:
+            gone = live[X] > width
+        dropped = np.flatnonzero(gone)
+        if not len(dropped):
+            return
+        count = self.count - len(dropped)
+        holes = dropped[dropped < count]
+        tail = np.flatnonzero(~gone[count:]) + count
+        self.data[:, holes] = self.data[:, tail]
+        self.count = count
+
+    # (x, y) of the entities on a screen `width` wide, for Surface.blits();
+    # the ones still queued off-screen are left out rather than clipped.
+    # Generated CHUNK at a time so a crowded screen doesn't build one huge list
+    def positions(self, width):
+        if not self.count:
+            return
+        x, y = self.x, self.y
+        on = (x < width) & (x + self.data[W, :self.count] > 0)
+        if self.count <= CHUNK:
+            yield from zip(x[on].tolist(), y[on].tolist())
+            return
+        on = np.flatnonzero(on)
+        for start in range(0, len(on), CHUNK):
+            part = on[start:start + CHUNK]
+            yield from zip(x[part].tolist(), y[part].tolist())
+
+
+# All kinds of scrolling objects in a game, moved and culled together
+class EntityStore:
+    def __init__(self):
+        self.kinds = {}
+
+    def add(self, name, size, velocity, capacity=64):
+        kind = self.kinds[name] = EntityKind(name, size, velocity, capacity)
+        return kind
+
+    def __getitem__(self, name):
+        return self.kinds[name]
+
+    def move(self):
+        for kind in self.kinds.values():
+            kind.move()
+
+    def cull(self, width):
+        for kind in self.kinds.values():
+            kind.cull(width)
+
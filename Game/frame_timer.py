@@ -0,0 +1,152 @@
+import bisect
+import csv
+import json
+import os
+from collections import deque
+from time import perf_counter
+
+# Environment configuration:
+#   QE_PROFILE      "1" to time frame phases, "overlay" to also show them on screen
+#   QE_PROFILE_OUT  where to write the histograms at exit (.json or .csv);
+#                   defaults to <game>-frames.json
+WINDOW = 300            # frames in the rolling p50/p99 window
+OVERLAY_REFRESH = 30    # frames between overlay percentile updates
+# Histogram bucket edges in microseconds, four per octave from 1 us to ~4 s
+EDGES_US = [2 ** (i / 4) for i in range(0, 89)]
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+def _no_rects(*args, **kwargs):
+    return []
+
+
+# Upper bucket edge (ms) below which a fraction q of the histogram falls
+def _histogram_percentile(counts, q):
+    target = q * sum(counts)
+    seen = 0
+    for i, count in enumerate(counts):
+        seen += count
+        if count and seen >= target:
+            return EDGES_US[min(i, len(EDGES_US) - 1)] / 1e3
+    return 0.0
+
+
+# Per-phase frame timings.
+#
+# A game loop calls start() at the top of every frame and mark(phase) after
+# each phase; the time since the previous mark is charged to that phase.
+# end_frame() closes the frame. Each phase keeps a rolling window for the
+# on-screen p50/p99 overlay and a log-scale histogram over the whole run,
+# written out by export().
+#
+# When disabled, start/mark/end_frame/draw_overlay are bound to no-ops, so
+# the calls can stay in the loops at the cost of one empty call each.
+class FrameTimer:
+    def __init__(self, game="game", enabled=False, overlay=False, out=None):
+        self.game = game
+        self.enabled = enabled
+        self.overlay = enabled and overlay
+        self.out = out
+        self.phases = []
+        self.recent = {}
+        self.histograms = {}
+        self.totals = {}
+        self.frames = 0
+        self.last = 0.0
+        self._current = {}
+        self._lines = []
+        if not enabled:
+            self.start = self.mark = self.end_frame = _noop
+            self.draw_overlay = _no_rects
+
+    @classmethod
+    def from_env(cls, game):
+        mode = os.environ.get("QE_PROFILE", "")
+        return cls(game, enabled=bool(mode) and mode != "0", overlay=mode == "overlay",
+                   out=os.environ.get("QE_PROFILE_OUT") or f"{game}-frames.json")
+
+    def start(self):
+        self._current.clear()
+        self.last = perf_counter()
+
+    def mark(self, phase):
+        now = perf_counter()
+        self._current[phase] = self._current.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    def end_frame(self):
+        self.frames += 1
+        for phase, seconds in self._current.items():
+            if phase not in self.recent:
+                self.phases.append(phase)
+                self.recent[phase] = deque(maxlen=WINDOW)
+                self.histograms[phase] = [0] * (len(EDGES_US) + 1)
+                self.totals[phase] = 0.0
+            self.recent[phase].append(seconds)
+            self.histograms[phase][bisect.bisect(EDGES_US, seconds * 1e6)] += 1
+            self.totals[phase] += seconds
+
+    # Rolling (p50, p99) in milliseconds for one phase
+    def percentiles(self, phase):
+        values = sorted(self.recent[phase])
+        if not values:
+            return 0.0, 0.0
+        last = len(values) - 1
+        return values[last // 2] * 1e3, values[(last * 99) // 100] * 1e3
+
+    # Draw the rolling percentiles in the bottom-left corner of `surface` and
+    # return the rects drawn, for dirty-rect renderers. The time spent here
+    # is not charged to any phase.
+    def draw_overlay(self, surface, font, color=(255, 255, 0)):
+        if not self.overlay:
+            return []
+        if self.frames % OVERLAY_REFRESH == 0 or not self._lines:
+            self._lines = [font.render(f"{phase:<10} p50 {p50:6.2f}  p99 {p99:6.2f} ms", True, color)
+                           for phase in self.phases for p50, p99 in [self.percentiles(phase)]]
+        drawn = []
+        y = surface.get_height() - 4
+        for line in reversed(self._lines):
+            y -= line.get_height()
+            drawn.append(surface.blit(line, (4, y)))
+        self.last = perf_counter()
+        return drawn
+
+    # Summary per phase over the whole run: frame count, mean, p50/p99 (to
+    # histogram bucket resolution) in ms, and the histogram as (upper edge in
+    # us, count) pairs for the non-empty buckets
+    def summary(self):
+        report = {}
+        for phase in self.phases:
+            counts = self.histograms[phase]
+            n = sum(counts)
+            report[phase] = {
+                "frames": n,
+                "mean_ms": self.totals[phase] / n * 1e3 if n else 0.0,
+                "p50_ms": _histogram_percentile(counts, 0.5),
+                "p99_ms": _histogram_percentile(counts, 0.99),
+                "histogram_us": [[EDGES_US[i] if i < len(EDGES_US) else None, count]
+                                 for i, count in enumerate(counts) if count],
+            }
+        return report
+
+    def export(self, path=None):
+        if not self.enabled or not self.frames:
+            return None
+        path = path or self.out
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["game", "phase", "bucket_low_us", "bucket_high_us", "count"])
+                for phase in self.phases:
+                    for i, count in enumerate(self.histograms[phase]):
+                        if count:
+                            low = EDGES_US[i - 1] if i else 0.0
+                            high = EDGES_US[i] if i < len(EDGES_US) else ""
+                            writer.writerow([self.game, phase, low, high, count])
+        else:
+            with open(path, "w") as f:
+                json.dump({"game": self.game, "frames": self.frames, "phases": self.summary()}, f, indent=2)
+        return path
@@ -1,79 +1,58 @@
+import argparse
 import pygame
-import random
-import os
+import sys
+import numpy as np
+from maze_engine import MazeEngine, TILE, RUNNING, WON
+from maze_entangled import EntangledMazeEngine, CNOT
+from maze_pack import LevelPack
+from assets import Assets
+from session import Session
+from frame_timer import FrameTimer
 
-# Initialize
-pygame.init()
 WIDTH, HEIGHT = 800, 640
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Quantum Escape: Entangled Mazes")
-clock = pygame.time.Clock()
-font = pygame.font.SysFont("Arial", 24)
 
-# Constants
-TILE = 40
-ROWS = HEIGHT // 2 // TILE
-COLS = WIDTH // TILE
-
-# Load Images
-def load(name):
-    return pygame.transform.scale(pygame.image.load(os.path.join("assets", name)), (TILE, TILE))
-
-player_img = load("player.png")
-wall_img = load("wall.png")
-key_img = load("key.png")
-exit_img = load("exit.png")
-obstacle_img = load("obstacle.png")
-check_img = load("check.png")
-cross_img = load("cross.png")
-
-# Quantum States
-state = "|0>"
-quantum_mode = False
-twin_player = None
-
-# Game Elements
-walls_0 = []
-walls_1 = []
-keys = []
-exit_rect = None
-obstacles = []
-
-# Build Maze
-def create_maze():
-    global walls_0, walls_1, keys, exit_rect, obstacles
-    walls_0.clear()
-    walls_1.clear()
-    keys.clear()
-    obstacles.clear()
-
-    for row in range(ROWS):
-        for col in range(COLS):
-            rect_top = pygame.Rect(col * TILE, row * TILE, TILE, TILE)
-            rect_bot = pygame.Rect(col * TILE, row * TILE + HEIGHT // 2, TILE, TILE)
-
-            if random.random() < 0.15:
-                walls_0.append(rect_top)
-            if random.random() < 0.15:
-                walls_1.append(rect_bot)
-
-            if random.random() < 0.02:
-                if rect_top not in walls_0:
-                    keys.append(rect_top)
-            if random.random() < 0.02:
-                if rect_bot not in walls_1:
-                    keys.append(rect_bot)
-
-            if random.random() < 0.08:
-                obstacles.append(rect_top if random.choice([True, False]) else rect_bot)
-
-    exit_rect = pygame.Rect(WIDTH - TILE, TILE if random.choice([0, 1]) == 0 else HEIGHT // 2 + TILE, TILE, TILE)
-
-create_maze()
-
-# Player
-player = pygame.Rect(TILE, TILE, TILE, TILE)
-has_key = False
+# Window, font and sprites, set up by init_display() so that importing this
+# module (e.g. for MazeRenderer) opens no window
+screen = clock = font = None
+player_img = wall_img = key_img = exit_img = obstacle_img = check_img = cross_img = None
+
+def init_display():
+    global screen, clock, font
+    global player_img, wall_img, key_img, exit_img, obstacle_img, check_img, cross_img
+    if screen is not None:
+        return
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Quantum Escape: Entangled Mazes")
+    clock = pygame.time.Clock()
+    font = pygame.font.SysFont("Arial", 24)
+
+    # Load Images (pre-scaled and display-converted, see assets.py)
+    assets = Assets()
+
+    def load(name):
+        return assets.image(name, (TILE, TILE))
+
+    player_img = load("player.png")
+    wall_img = load("wall.png")
+    key_img = load("key.png")
+    exit_img = load("exit.png")
+    obstacle_img = load("obstacle.png")
+    check_img = load("check.png")
+    cross_img = load("cross.png")
+
+# Keyboard to engine actions
+KEY_ACTIONS = {
+    pygame.K_LEFT: "LEFT",
+    pygame.K_RIGHT: "RIGHT",
+    pygame.K_UP: "UP",
+    pygame.K_DOWN: "DOWN",
+    pygame.K_x: "X",
+    pygame.K_z: "Z",
+    pygame.K_h: "H",
+}
+# Keys a session records: actions, CNOT, hint and player selection
+TRACKED_KEYS = list(KEY_ACTIONS) + [pygame.K_c, pygame.K_TAB] + list(range(pygame.K_1, pygame.K_9 + 1))
 
 # Instructions Screen
 def show_instructions():
@@ -89,6 +68,8 @@ def show_instructions():
         "- In quantum mode, player cannot move. Obstacles auto-move upward.",
         "- Use LEFT/RIGHT keys to move obstacles horizontally in quantum mode.",
         "- Collect the key and reach the exit to win.",
+        "- Hold TAB to show the next best move.",
+        "- Multi-player (--players N): 1-9 select a player, C applies CNOT.",
         "- Avoid obstacles. In quantum mode, collisions trigger measurement.",
         "",
         "Press any key to start..."
@@ -106,157 +87,192 @@ def show_instructions():
             if event.type == pygame.KEYDOWN:
                 waiting = False
 
-show_instructions()
-
 # Clear screen on win/loss
-def clear_screen(message):
+def clear_screen(message, wait=3000):
     screen.fill((0, 0, 0))
     text = font.render(message, True, (255, 255, 255))
     screen.blit(text, (WIDTH // 2 - text.get_width() // 2, HEIGHT // 2 - text.get_height() // 2))
     pygame.display.flip()
-    pygame.time.wait(3000)
-
-# Draw Function
-def draw():
-    screen.fill((0, 0, 0))
-    pygame.draw.line(screen, (255, 255, 255), (0, HEIGHT//2), (WIDTH, HEIGHT//2), 2)
-
-    for w in walls_0:
-        screen.blit(wall_img, w)
-    for w in walls_1:
-        screen.blit(wall_img, w)
-    for k in keys:
-        screen.blit(key_img, k)
-    for o in obstacles:
-        screen.blit(obstacle_img, o)
-
-    screen.blit(exit_img, exit_rect)
-    screen.blit(player_img, player)
-    if twin_player:
-        screen.blit(player_img, twin_player)
-
-    # UI
-    state_text = font.render(f"State: {state}", True, (0, 255, 255))
-    screen.blit(state_text, (WIDTH - 200, 10))
-    screen.blit(font.render("Key:", True, (255, 255, 0)), (WIDTH - 200, 40))
-    screen.blit(check_img if has_key else cross_img, (WIDTH - 130, 40))
-
-    pygame.display.flip()
-
-# State Functions
-def apply_gate(gate):
-    global state, quantum_mode, twin_player
-    if gate == "X" and not quantum_mode:
-        if state == "|0>":
-            state = "|1>"
-            player.y += HEIGHT // 2
+    pygame.time.wait(wait)
+
+# Renderer
+# Walls, keys, the exit and the layer divider never move, so they are drawn
+# once into a background surface. Each frame only the rectangles covered by
+# the player, twin, obstacles and HUD are restored from it, redrawn and
+# pushed with pygame.display.update() by present(). The background is
+# rebuilt whenever the engine's layout_version changes (new maze, key
+# picked up).
+MAX_DIRTY_RECTS = 256
+SPRITE_LIMIT = 2000             # above this many visible obstacles, draw a mask
+OBSTACLE_COLOR = (200, 60, 60)
+
+class MazeRenderer:
+    def __init__(self, engine):
+        self.engine = engine
+        self.background = None
+        self.layout_version = None
+        self.dirty = []
+        self.drawn = []
+        self.full_redraw = False
+        self.show_hint = False
+
+    def build_background(self):
+        engine = self.engine
+        background = pygame.Surface((WIDTH, HEIGHT))
+        background.fill((0, 0, 0))
+        pygame.draw.line(background, (255, 255, 255), (0, HEIGHT//2), (WIDTH, HEIGHT//2), 2)
+
+        for layer, row, col in np.argwhere(engine.walls):
+            background.blit(wall_img, engine.tile_rect(layer, row, col))
+        for layer, row, col in np.argwhere(engine.keys):
+            background.blit(key_img, engine.tile_rect(layer, row, col))
+        background.blit(exit_img, engine.exit_rect)
+        background.blit(font.render("Key:", True, (255, 255, 0)), (WIDTH - 200, 40))
+
+        self.background = background
+        self.layout_version = engine.layout_version
+
+    # Dense stress levels: paint the union of all obstacle squares in one
+    # colour. Coverage comes from a 2D difference array (+1/-1 at the square
+    # corners, then cumulative sums), so the cost is per obstacle plus per
+    # pixel rather than one blit per obstacle.
+    def draw_obstacle_mask(self, xs, ys):
+        x0, x1 = np.clip(xs, 0, WIDTH), np.clip(xs + TILE, 0, WIDTH)
+        y0, y1 = np.clip(ys, 0, HEIGHT), np.clip(ys + TILE, 0, HEIGHT)
+        stride = HEIGHT + 1
+        corners = np.concatenate([x0 * stride + y0, x1 * stride + y1, x1 * stride + y0, x0 * stride + y1])
+        signs = np.repeat(np.array([1, 1, -1, -1], dtype=np.float32), len(xs))
+        diff = np.bincount(corners, signs, (WIDTH + 1) * stride).astype(np.int32)
+        cover = diff.reshape(WIDTH + 1, stride).cumsum(0).cumsum(1)[:WIDTH, :HEIGHT] > 0
+        pixels = pygame.surfarray.pixels2d(screen)
+        np.putmask(pixels, cover, screen.map_rgb(OBSTACLE_COLOR))
+        del pixels
+        return screen.get_rect()
+
+    def draw(self):
+        engine = self.engine
+        full_redraw = engine.layout_version != self.layout_version
+        if full_redraw:
+            self.build_background()
+        if full_redraw or len(self.dirty) > MAX_DIRTY_RECTS:
+            screen.blit(self.background, (0, 0))
         else:
-            state = "|0>"
-            player.y -= HEIGHT // 2
-    elif gate == "Z" and quantum_mode:
-        state = "|->" if state == "|+>" else "|+>"
-    elif gate == "H":
-        if state == "|0>":
-            state = "|+>"
-            quantum_mode = True
-            twin_player = player.copy()
-            twin_player.y += HEIGHT // 2
-        elif state == "|1>":
-            state = "|->"
-            quantum_mode = True
-            twin_player = player.copy()
-            twin_player.y -= HEIGHT // 2
-        elif state == "|+>":
-            state = "|0>"
-            quantum_mode = False
-            twin_player = None
-        elif state == "|->":
-            state = "|1>"
-            quantum_mode = False
-            twin_player = None
-
-def measure_collapse():
-    global state, quantum_mode, player, twin_player
-    result = random.choice(["|0>", "|1>"])
-    if result == "|0>":
-        state = "|0>"
-        player.y = player.y % (HEIGHT // 2)
-    else:
-        state = "|1>"
-        player.y = player.y % (HEIGHT // 2) + HEIGHT // 2
-    quantum_mode = False
-    twin_player = None
-
-# Game Loop
-running = True
-while running:
-    clock.tick(30)
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-
-    keys_pressed = pygame.key.get_pressed()
-    dx = dy = 0
-
-    if not quantum_mode:
-        if keys_pressed[pygame.K_LEFT]: dx = -TILE
-        if keys_pressed[pygame.K_RIGHT]: dx = TILE
-        if keys_pressed[pygame.K_UP]: dy = -TILE
-        if keys_pressed[pygame.K_DOWN]: dy = TILE
-
-        new_pos = player.move(dx, dy)
-        if state == "|0>":
-            if not any(w.colliderect(new_pos) for w in walls_0):
-                player = new_pos
+            for rect in self.dirty:
+                screen.blit(self.background, rect, rect)
+
+        # Obstacles are drawn straight from the engine's position arrays
+        xs, ys = engine.obstacles.x, engine.obstacles.y
+        visible = (xs > -TILE) & (xs < WIDTH) & (ys > -TILE) & (ys < HEIGHT)
+        xs, ys = xs[visible], ys[visible]
+        if len(xs) <= SPRITE_LIMIT:
+            drawn = screen.blits([(obstacle_img, pos) for pos in zip(xs.tolist(), ys.tolist())])
         else:
-            if not any(w.colliderect(new_pos) for w in walls_1):
-                player = new_pos
-
-    # Quantum gate keys
-    if keys_pressed[pygame.K_x]: apply_gate("X")
-    if keys_pressed[pygame.K_z]: apply_gate("Z")
-    if keys_pressed[pygame.K_h]: apply_gate("H")
-
-    # Random gate
-    r = random.randint(0, 300)
-    if r in [100, 200]: apply_gate("X")
-    if r in [50, 250]: apply_gate("Z")
-    if r == 150: apply_gate("H")
+            drawn = [self.draw_obstacle_mask(xs, ys)]
+        drawn.extend(screen.blits([(player_img, rect) for rect in engine.player_rects()]))
+
+        # UI
+        state_text = font.render(engine.state_label(), True, (0, 255, 255))
+        drawn.append(screen.blit(state_text, (WIDTH - 200, 10)))
+        drawn.append(screen.blit(check_img if engine.has_key else cross_img, (WIDTH - 130, 40)))
+        if self.show_hint:
+            hint_text = font.render(f"Hint: {engine.hint() or '-'}", True, (0, 255, 0))
+            drawn.append(screen.blit(hint_text, (WIDTH - 200, 80)))
+        self.drawn = drawn
+        self.full_redraw = full_redraw
+
+    # Push the frame to the display; `extra` are rects drawn over it since draw()
+    def present(self, extra=()):
+        drawn = self.drawn + list(extra)
+        if self.full_redraw or len(self.dirty) + len(drawn) > MAX_DIRTY_RECTS:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.dirty + drawn)
+        self.dirty = drawn
+
+def read_actions(engine, keys_pressed):
+    actions = {action for key, action in KEY_ACTIONS.items() if keys_pressed[key]}
+    if isinstance(engine, EntangledMazeEngine):
+        # Keys act on the selected player; C entangles it with the next one
+        player = engine.selected
+        actions = {(action, player) for action in actions}
+        if keys_pressed[pygame.K_c]:
+            actions.add((CNOT, player, (player + 1) % engine.n_players))
+    return actions
 
-    # Obstacle movement
-    if quantum_mode:
-        dx = 0
-        if keys_pressed[pygame.K_LEFT]: dx = -TILE
-        if keys_pressed[pygame.K_RIGHT]: dx = TILE
-        for i, obs in enumerate(obstacles):
-            obstacles[i].x += dx
-            obstacles[i].y -= 2
-            if obstacles[i].y < 0:
-                obstacles[i].y = HEIGHT - TILE
+# Game Loop
+def parse_args():
+    parser = argparse.ArgumentParser(description="Quantum Escape: Entangled Mazes")
+    parser.add_argument("--seed", type=int, default=None, help="play a fixed generated board")
+    parser.add_argument("--pack", help="play levels from a maze_pack.py level pack")
+    parser.add_argument("--level", type=int, default=0, help="first level to play from --pack")
+    parser.add_argument("--players", type=int, default=1,
+                        help="entangled multi-player mode with this many players (1-9)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    init_display()
+    rows, cols = HEIGHT // 2 // TILE, WIDTH // TILE
+    pack = level = None
+    if args.pack:
+        pack = LevelPack(args.pack)
+        if (pack.rows, pack.cols) != (rows, cols):
+            raise SystemExit(f"{args.pack} holds {pack.rows}x{pack.cols} levels, "
+                             f"this window shows {rows}x{cols}")
+        level = args.level
+    layout = pack[level] if pack else None
+    session = Session.from_env("maze", TRACKED_KEYS, sys.argv[1:], seed=args.seed)
+    if args.players > 1:
+        engine = EntangledMazeEngine(min(args.players, 9), rows, cols, seed=args.seed, layout=layout,
+                                     streams=session.rng)
     else:
-        for i, obs in enumerate(obstacles):
-            obstacles[i].x -= 2
-            if obstacles[i].x < -TILE:
-                obstacles[i].x = WIDTH
-
-    # Collisions
-    for obs in obstacles:
-        if player.colliderect(obs) or (twin_player and twin_player.colliderect(obs)):
-            if quantum_mode:
-                measure_collapse()
-            else:
-                clear_screen("You were hit! Game Over.")
+        engine = MazeEngine(rows, cols, seed=args.seed, layout=layout, streams=session.rng)
+    renderer = MazeRenderer(engine)
+    # Per-phase frame timings, enabled with QE_PROFILE (see frame_timer.py)
+    timer = FrameTimer.from_env("maze")
+    pause = 0 if session.replaying else 3000
+    if not session.replaying:
+        show_instructions()
+
+    running = True
+    while running:
+        timer.start()
+        for event in session.events():
+            if event.type == pygame.QUIT:
                 running = False
-
-    for k in keys[:]:
-        if player.colliderect(k):
-            keys.remove(k)
-            has_key = True
-
-    if has_key and player.colliderect(exit_rect):
-        clear_screen("You escaped the quantum maze!")
-        running = False
-
-    draw()
-
-pygame.quit()
+            elif event.type == pygame.KEYDOWN and pygame.K_1 <= event.key <= pygame.K_9:
+                if isinstance(engine, EntangledMazeEngine) and event.key - pygame.K_1 < engine.n_players:
+                    engine.selected = event.key - pygame.K_1
+        timer.mark("events")
+
+        keys_pressed = session.pressed()
+        renderer.show_hint = keys_pressed[pygame.K_TAB]
+        actions = read_actions(engine, keys_pressed)
+        timer.mark("input")
+        status = engine.step(actions)
+        timer.mark("step")
+        if status == RUNNING:
+            renderer.draw()
+            timer.mark("draw")
+            renderer.present(timer.draw_overlay(screen, font))
+            timer.mark("flip")
+        elif status == WON and pack and level + 1 < len(pack):
+            # Next level from the pack
+            level += 1
+            clear_screen(f"{engine.message} Level {level + 1}...", pause)
+            engine.reset(pack[level])
+        else:
+            clear_screen(engine.message, pause)
+            running = False
+        timer.end_frame()
+        session.tick(clock, 30)
+
+    session.finish(status=engine.status, level=level, ticks=engine.ticks, has_key=engine.has_key,
+                   player=[int(v) for v in engine.player], state=engine.state_label())
+    timer.export()
+    if pack:
+        pack.close()
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
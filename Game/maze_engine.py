@@ -0,0 +1,318 @@
+import numpy as np
+import pygame
+from maze_gen import generate_solvable_maze
+from maze_solver import DistanceField
+from rng_streams import RngStreams
+
+# Constants
+TILE = 40   # pixel size of a tile; obstacles move in these units
+ROWS = 8    # default board, matching the original 800x640 window
+COLS = 20
+
+# Actions understood by MazeEngine.step()
+MOVES = {
+    "LEFT": (-1, 0),
+    "RIGHT": (1, 0),
+    "UP": (0, -1),
+    "DOWN": (0, 1),
+}
+GATES = ("X", "Z", "H")
+
+# Status values
+RUNNING = "running"
+WON = "won"
+LOST = "lost"
+
+
+# Moving obstacles as a structure of arrays: pixel positions and classical
+# drift velocities, one entry per obstacle, in world coordinates (layer |1>
+# stacked under layer |0>). Movement, wrap-around and overlap tests are
+# single vectorized operations over all obstacles.
+class ObstacleField:
+    def __init__(self, size, width, height):
+        self.size = size
+        self.width = width
+        self.height = height
+        self.x = np.empty(0, dtype=np.int32)
+        self.y = np.empty(0, dtype=np.int32)
+        self.vx = np.empty(0, dtype=np.int32)
+        self.vy = np.empty(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.x)
+
+    def clear(self):
+        self.set(np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32))
+
+    def set(self, x, y, vx=-2, vy=0):
+        self.x = np.asarray(x, dtype=np.int32).copy()
+        self.y = np.asarray(y, dtype=np.int32).copy()
+        self.vx = np.broadcast_to(np.asarray(vx, dtype=np.int32), self.x.shape).copy()
+        self.vy = np.broadcast_to(np.asarray(vy, dtype=np.int32), self.x.shape).copy()
+
+    def add(self, x, y, vx, vy):
+        self.x = np.concatenate([self.x, np.asarray(x, dtype=np.int32)])
+        self.y = np.concatenate([self.y, np.asarray(y, dtype=np.int32)])
+        self.vx = np.concatenate([self.vx, np.asarray(vx, dtype=np.int32)])
+        self.vy = np.concatenate([self.vy, np.asarray(vy, dtype=np.int32)])
+
+    # Classical mode: every obstacle follows its own velocity and wraps
+    # around to the opposite edge once fully off screen
+    def drift(self):
+        size = self.size
+        self.x += self.vx
+        self.y += self.vy
+        self.x[self.x < -size] = self.width
+        self.x[self.x > self.width] = -size
+        self.y[self.y < -size] = self.height
+        self.y[self.y > self.height] = -size
+
+    # Quantum mode: all obstacles rise together and are steered sideways by
+    # the player, wrapping back to the bottom
+    def quantum_drift(self, dx, dy=-2):
+        if dx:
+            self.x += dx
+        self.y += dy
+        self.y[self.y < 0] = self.height - self.size
+
+    # True if any obstacle overlaps one of the size x size squares at the
+    # given top-left corners
+    def hits(self, *corners):
+        size = self.size
+        for x, y in corners:
+            if np.any((np.abs(self.y - y) < size) & (np.abs(self.x - x) < size)):
+                return True
+        return False
+
+    # Scatter `count` extra obstacles with random positions and velocities,
+    # for stress levels
+    def scatter(self, count, rng, max_speed=3):
+        x = rng.integers(-self.size, self.width, count)
+        y = rng.integers(0, self.height - self.size, count)
+        vx = rng.integers(-max_speed, 0, count)
+        vy = rng.integers(-1, 2, count)
+        self.add(x, y, vx, vy)
+
+
+# Display-free game logic for Quantum Escape. Only pygame.Rect is used, so
+# the engine runs without a window and without a frame clock.
+#
+# The board is indexed by tile: walls and keys are (layer, row, col) boolean
+# grids, so "is this tile blocked in |0>/|1>" is a single array lookup. The
+# player, twin and exit are tile positions. Obstacles move in pixels and
+# live in an ObstacleField.
+#
+# Randomness comes from `streams` (an RngStreams, seeded from `seed` by
+# default): boards from the spawn stream, random gates from the gates
+# stream and measurements from the collapse stream.
+class MazeEngine:
+    def __init__(self, rows=ROWS, cols=COLS, tile=TILE, seed=None, random_gates=True, layout=None,
+                 streams=None):
+        self.rows = rows
+        self.cols = cols
+        self.tile = tile
+        self.width = cols * tile
+        self.half = rows * tile
+        self.height = 2 * self.half
+        self.seed = seed
+        self.random_gates = random_gates
+        self.streams = streams if streams is not None else RngStreams(seed)
+
+        # Game elements
+        self.walls = np.zeros((2, self.rows, self.cols), dtype=bool)
+        self.keys = np.zeros((2, self.rows, self.cols), dtype=bool)
+        self.exit = None
+        self.obstacles = ObstacleField(tile, self.width, self.height)
+        # Bumped whenever walls, keys or the exit change, so renderers can
+        # cache the static part of the board
+        self.layout_version = 0
+        self.reset(layout)
+
+    @property
+    def walls_0(self):
+        return self.walls[0]
+
+    @property
+    def walls_1(self):
+        return self.walls[1]
+
+    # Start over on `layout` (e.g. from a level pack), or on a freshly
+    # generated board; a fixed seed replays the same board
+    def reset(self, layout=None):
+        if layout is None:
+            self.create_maze()
+        else:
+            self.load_layout(layout)
+        self.twin_player = None
+        self.state = "|0>" if self.player[0] == 0 else "|1>"
+        self.quantum_mode = False
+        self.has_key = False
+        self.status = RUNNING
+        self.message = ""
+        self.ticks = 0
+
+    # Tile queries
+    def in_bounds(self, row, col):
+        return 0 <= row < self.rows and 0 <= col < self.cols
+
+    def is_blocked(self, layer, row, col):
+        return not self.in_bounds(row, col) or bool(self.walls[layer, row, col])
+
+    def key_at(self, layer, row, col):
+        return bool(self.keys[layer, row, col])
+
+    def obstacle_at(self, layer, row, col):
+        return self.obstacles.hits(self.tile_xy(layer, row, col))
+
+    def is_exit(self, layer, row, col):
+        return self.exit == (layer, row, col)
+
+    def tile_xy(self, layer, row, col):
+        return col * self.tile, layer * self.half + row * self.tile
+
+    def tile_rect(self, layer, row, col):
+        return pygame.Rect(*self.tile_xy(layer, row, col), self.tile, self.tile)
+
+    @property
+    def player_rect(self):
+        return self.tile_rect(*self.player)
+
+    @property
+    def twin_rect(self):
+        return self.tile_rect(*self.twin_player) if self.twin_player else None
+
+    @property
+    def exit_rect(self):
+        return self.tile_rect(*self.exit)
+
+    # Everything a renderer needs to draw the player(s) and label their state
+    def player_rects(self):
+        rects = [self.player_rect]
+        if self.twin_player:
+            rects.append(self.twin_rect)
+        return rects
+
+    def state_label(self):
+        return f"State: {self.state}"
+
+    # Build Maze
+    def create_maze(self):
+        seed = self.seed if self.seed is not None else self.streams.spawn.getrandbits(63)
+        self.load_layout(generate_solvable_maze(self.rows, self.cols, seed))
+
+    def load_layout(self, layout):
+        if (layout.rows, layout.cols) != (self.rows, self.cols):
+            raise ValueError("layout is %dx%d, engine expects %dx%d"
+                             % (layout.rows, layout.cols, self.rows, self.cols))
+        self.walls[:] = layout.walls
+        self.keys[:] = layout.keys
+        self.exit = layout.exit
+        self.player = layout.start
+        layer, row, col = layout.obstacles.T
+        self.obstacles.set(col * self.tile, (layer * self.rows + row) * self.tile)
+        if layout.field is None:
+            layout.field = DistanceField(layout.walls, layout.keys, layout.exit)
+        self.field = layout.field
+        self.layout_version += 1
+
+    # Next best action towards the exit from the cached distance field, or
+    # None if the exit is out of reach. In superposition the only useful
+    # move is to leave it with H.
+    def hint(self):
+        if self.quantum_mode:
+            return "H"
+        return self.field.next_move(self.player, self.has_key)
+
+    # State Functions
+    def apply_gate(self, gate):
+        layer, row, col = self.player
+        if gate == "X" and not self.quantum_mode:
+            if self.state == "|0>":
+                self.state = "|1>"
+            else:
+                self.state = "|0>"
+            self.player = (1 - layer, row, col)
+        elif gate == "Z" and self.quantum_mode:
+            self.state = "|->" if self.state == "|+>" else "|+>"
+        elif gate == "H":
+            if self.state in ("|0>", "|1>"):
+                self.state = "|+>" if self.state == "|0>" else "|->"
+                self.quantum_mode = True
+                self.twin_player = (1 - layer, row, col)
+            else:
+                self.state = "|0>" if self.state == "|+>" else "|1>"
+                self.quantum_mode = False
+                self.twin_player = None
+
+    def measure_collapse(self):
+        _, row, col = self.player
+        result = self.streams.collapse.choice(["|0>", "|1>"])
+        self.state = result
+        self.player = (0 if result == "|0>" else 1, row, col)
+        self.quantum_mode = False
+        self.twin_player = None
+
+    def move_player(self, dx, dy):
+        layer, row, col = self.player
+        if not self.is_blocked(layer, row + dy, col + dx):
+            self.player = (layer, row + dy, col + dx)
+
+    def move_obstacles(self, dx):
+        if self.quantum_mode:
+            self.obstacles.quantum_drift(dx * self.tile)
+        else:
+            self.obstacles.drift()
+
+    def check_collisions(self):
+        corners = [self.tile_xy(*self.player)]
+        if self.twin_player:
+            corners.append(self.tile_xy(*self.twin_player))
+        if self.obstacles.hits(*corners):
+            if self.quantum_mode:
+                self.measure_collapse()
+            else:
+                self.status = LOST
+                self.message = "You were hit! Game Over."
+                return
+
+        if self.key_at(*self.player):
+            self.keys[self.player] = False
+            self.has_key = True
+            self.layout_version += 1
+
+        if self.has_key and self.is_exit(*self.player):
+            self.status = WON
+            self.message = "You escaped the quantum maze!"
+
+    # Advance the game by one tick. `actions` is a collection of MOVES and
+    # GATES names held down during this tick.
+    def step(self, actions=()):
+        if self.status != RUNNING:
+            return self.status
+        self.ticks += 1
+
+        dx = dy = 0
+        for name, (mx, my) in MOVES.items():
+            if name in actions:
+                dx = mx or dx
+                dy = my or dy
+
+        if not self.quantum_mode and (dx or dy):
+            self.move_player(dx, dy)
+
+        # Quantum gate keys
+        for gate in GATES:
+            if gate in actions:
+                self.apply_gate(gate)
+
+        # Random gate
+        if self.random_gates:
+            r = self.streams.gates.randint(0, 300)
+            if r in [100, 200]: self.apply_gate("X")
+            if r in [50, 250]: self.apply_gate("Z")
+            if r == 150: self.apply_gate("H")
+
+        # Obstacle movement
+        self.move_obstacles(dx)
+        self.check_collisions()
+        return self.status
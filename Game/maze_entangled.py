@@ -0,0 +1,152 @@
+from maze_engine import MazeEngine, MOVES, GATES, ROWS, COLS, TILE, RUNNING, WON, LOST
+from rng_streams import RngStreams
+from stabilizer import Tableau
+
+# Two-qubit gate understood by EntangledMazeEngine.step(), on top of MOVES/GATES
+CNOT = "CNOT"
+ACTION_ORDER = {name: i for i, name in enumerate(list(MOVES) + list(GATES) + [CNOT])}
+
+
+# Multi-qubit mode: each of `players` players is one qubit of a shared
+# stabilizer tableau, so players can be entangled with H, X, Z and CNOT.
+#
+# A player whose qubit has a definite Z value stands in that layer and can
+# move. A player whose value is random is in superposition: it shows up in
+# both layers, cannot move, and an obstacle hit measures its qubit, which
+# also collapses every player entangled with it. A hit on a player with a
+# definite layer knocks that player out. The key is shared; any player
+# reaching the exit with it wins, and the game is lost when no one is left.
+class EntangledMazeEngine(MazeEngine):
+    def __init__(self, players=2, rows=ROWS, cols=COLS, tile=TILE, seed=None, layout=None, rng=None,
+                 streams=None):
+        self.n_players = players
+        self.streams = streams if streams is not None else RngStreams(seed)
+        self.rng = rng if rng is not None else self.streams.generator("collapse")
+        super().__init__(rows, cols, tile, seed, random_gates=False, layout=layout, streams=self.streams)
+
+    def reset(self, layout=None):
+        super().reset(layout)
+        start_layer, row, col = self.player
+        self.qubits = Tableau(self.n_players, self.rng)
+        if start_layer:
+            for i in range(self.n_players):
+                self.qubits.x_gate(i)
+        self.positions = [(row, col)] * self.n_players
+        self.alive = [True] * self.n_players
+        self.selected = 0
+        # Cached measurement outcome per qubit (None = superposed), refreshed
+        # lazily for qubits touched by a gate or a measurement
+        self._layers = [start_layer] * self.n_players
+        self._stale = set()
+
+    # Layer of player i, or None while it is in superposition
+    def layer_of(self, i):
+        if i in self._stale:
+            self._layers[i] = self.qubits.peek(i)
+            self._stale.discard(i)
+        return self._layers[i]
+
+    # Tiles player i currently occupies: one, or both layers if superposed
+    def tiles_of(self, i):
+        row, col = self.positions[i]
+        layer = self.layer_of(i)
+        if layer is None:
+            return [(0, row, col), (1, row, col)]
+        return [(layer, row, col)]
+
+    def player_rects(self):
+        return [self.tile_rect(*tile) for i in range(self.n_players) if self.alive[i]
+                for tile in self.tiles_of(i)]
+
+    def state_label(self):
+        layer = self.layer_of(self.selected)
+        label = "superposed" if layer is None else f"|{layer}>"
+        return f"P{self.selected + 1}: {label}"
+
+    def hint(self):
+        layer = self.layer_of(self.selected)
+        if layer is None:
+            return "H"
+        return self.field.next_move((layer, *self.positions[self.selected]), self.has_key)
+
+    # Gates
+    def apply_player_gate(self, gate, i, target=None):
+        if gate == "X":
+            self.qubits.x_gate(i)
+        elif gate == "Z":
+            self.qubits.z_gate(i)
+        elif gate == "H":
+            self.qubits.h(i)
+        elif gate == CNOT:
+            if target is None or target == i:
+                return
+            self.qubits.cnot(i, target)
+            self._stale.add(target)
+        self._stale.add(i)
+
+    def measure_player(self, i):
+        outcome = self.qubits.measure(i)
+        # A joint measurement can decide any entangled partner as well
+        self._stale.update(range(self.n_players))
+        return outcome
+
+    def move_player_i(self, i, dx, dy):
+        layer = self.layer_of(i)
+        row, col = self.positions[i]
+        if layer is not None and not self.is_blocked(layer, row + dy, col + dx):
+            self.positions[i] = (row + dy, col + dx)
+
+    def check_collisions(self):
+        for i in range(self.n_players):
+            if not self.alive[i]:
+                continue
+            corners = [self.tile_xy(*tile) for tile in self.tiles_of(i)]
+            if not self.obstacles.hits(*corners):
+                continue
+            if len(corners) > 1:
+                self.measure_player(i)
+            else:
+                self.alive[i] = False
+                self.message = f"Player {i + 1} was hit!"
+
+        if not any(self.alive):
+            self.status = LOST
+            self.message = "Every player was hit! Game Over."
+            return
+
+        for i in range(self.n_players):
+            if not self.alive[i]:
+                continue
+            layer = self.layer_of(i)
+            if layer is None:
+                continue
+            tile = (layer, *self.positions[i])
+            if self.key_at(*tile):
+                self.keys[tile] = False
+                self.has_key = True
+                self.layout_version += 1
+            if self.has_key and self.is_exit(*tile):
+                self.status = WON
+                self.message = f"Player {i + 1} escaped the quantum maze!"
+                return
+
+    # Advance one tick. `actions` holds (action, player) tuples with a MOVES
+    # or GATES name, or (CNOT, control, target). They are applied per player
+    # in a fixed order, so a tick does not depend on set iteration order.
+    def step(self, actions=()):
+        if self.status != RUNNING:
+            return self.status
+        self.ticks += 1
+
+        for action in sorted(actions, key=lambda a: (a[1], ACTION_ORDER[a[0]], a[2:])):
+            name, i = action[0], action[1]
+            if not self.alive[i]:
+                continue
+            if name in MOVES:
+                self.move_player_i(i, *MOVES[name])
+            else:
+                self.apply_player_gate(name, i, *action[2:])
+
+        self.obstacles.drift()
+        self.check_collisions()
+        return self.status
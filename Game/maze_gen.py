@@ -0,0 +1,109 @@
+import numpy as np
+from maze_solver import DistanceField
+
+# Default generation probabilities (per tile, per layer)
+WALL_PROB = 0.15
+KEY_PROB = 0.02        # chance of a key on a tile that is not a wall
+OBSTACLE_PROB = 0.08   # chance of an obstacle on a tile, in either layer
+
+# Random draws are 16-bit integers compared against scaled thresholds, which
+# is several times cheaper than float64 draws on big boards.
+_SCALE = 1 << 16
+
+
+# A generated board, in tile units and independent of any screen size.
+#   walls, keys: (2, rows, cols) bool, indexed [layer, row, col]
+#   obstacles:   (N, 3) int32 of (layer, row, col) starting tiles
+#   start, exit: (layer, row, col) tuples
+#   field:       cached maze_solver.DistanceField, or None until solved
+class MazeLayout:
+    def __init__(self, walls, keys, obstacles, start, exit, seed=None):
+        self.walls = walls
+        self.keys = keys
+        self.obstacles = obstacles
+        self.start = start
+        self.exit = exit
+        self.seed = seed
+        self.field = None
+
+    @property
+    def rows(self):
+        return self.walls.shape[1]
+
+    @property
+    def cols(self):
+        return self.walls.shape[2]
+
+
+# Build both layers, keys and obstacles in bulk from `seed`. The same seed
+# and parameters always give the same layout.
+def generate_maze(rows, cols, seed=None, wall_prob=WALL_PROB, key_prob=KEY_PROB,
+                  obstacle_prob=OBSTACLE_PROB):
+    if rows < 2 or cols < 2:
+        raise ValueError("maze needs at least 2 rows and 2 columns")
+    rng = np.random.default_rng(seed)
+
+    # One draw per (layer, tile) decides wall / key / empty
+    draw = rng.integers(0, _SCALE, size=(2, rows, cols), dtype=np.uint16)
+    wall_cut = int(wall_prob * _SCALE)
+    key_cut = wall_cut + int(key_prob * (1 - wall_prob) * _SCALE)
+    walls = draw < wall_cut
+    keys = draw < key_cut
+    keys &= ~walls
+    del draw
+
+    # One draw per tile decides whether it starts an obstacle, and in which layer
+    draw = rng.integers(0, _SCALE, size=(rows, cols), dtype=np.uint16)
+    obstacle_cut = int(obstacle_prob * _SCALE)
+    obs_row, obs_col = np.nonzero(draw < obstacle_cut)
+    obs_layer = (draw[obs_row, obs_col] >= obstacle_cut // 2).astype(np.int32)
+    obstacles = np.stack([obs_layer, obs_row.astype(np.int32), obs_col.astype(np.int32)], axis=1)
+    del draw
+
+    start = (0, 1, 1)
+    exit = (int(rng.integers(2)), 1, cols - 1)
+
+    # The start and exit tiles are always open, and nothing spawns on the player
+    walls[start] = keys[start] = False
+    walls[exit] = False
+    at_start = (obstacles[:, 0] == start[0]) & (obstacles[:, 1] == start[1]) & (obstacles[:, 2] == start[2])
+    obstacles = obstacles[~at_start]
+
+    return MazeLayout(walls, keys, obstacles, start, exit, seed)
+
+
+# Like generate_maze(), but never returns an unwinnable board. Unsolvable
+# layouts are rejected and regenerated from seeds derived from `seed`; if
+# every attempt fails, the last one is repaired by carving a corridor from
+# the start to the exit and putting a key on it.
+def generate_solvable_maze(rows, cols, seed=None, max_attempts=8, **kwargs):
+    layout = None
+    for attempt in range(max_attempts):
+        attempt_seed = seed if attempt == 0 or seed is None else [seed, attempt]
+        layout = generate_maze(rows, cols, attempt_seed, **kwargs)
+        layout.field = DistanceField(layout.walls, layout.keys, layout.exit)
+        if layout.field.solvable(layout.start):
+            return layout
+    repair_maze(layout)
+    layout.field = DistanceField(layout.walls, layout.keys, layout.exit)
+    return layout
+
+
+# Open an L-shaped corridor in the start layer (along the start row, then the
+# exit column) and place a key next to the start. The exit layer is then
+# one free X gate away.
+def repair_maze(layout):
+    layer, start_row, start_col = layout.start
+    _, exit_row, exit_col = layout.exit
+    step = 1 if exit_col >= start_col else -1
+    low, high = sorted((start_col, exit_col))
+    layout.walls[layer, start_row, low:high + 1] = False
+    low, high = sorted((start_row, exit_row))
+    layout.walls[layer, low:high + 1, exit_col] = False
+    layout.walls[layout.exit] = False
+
+    if start_col != exit_col:
+        key = (layer, start_row, start_col + step)
+    else:
+        key = (layer, start_row + (1 if exit_row > start_row else -1), start_col)
+    layout.keys[key] = True
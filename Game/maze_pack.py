@@ -0,0 +1,154 @@
+import argparse
+import mmap
+import os
+import struct
+from multiprocessing import Pool
+
+import numpy as np
+from maze_gen import MazeLayout, generate_solvable_maze
+
+# Pack file layout (all little-endian):
+#   header   magic, version, level count, rows, cols, base seed
+#   index    (count + 1) uint64 absolute offsets; level i is [idx[i], idx[i+1])
+#   levels   record header, then np.packbits() of the (2, rows, cols) wall
+#            and key grids, then obstacle start tiles as uint32 indices
+#            into the flattened (2, rows, cols) grid
+MAGIC = b"QMZP"
+VERSION = 2
+HEADER = struct.Struct("<4sHIIIq")
+RECORD = struct.Struct("<QBIIBIII")   # seed, start (l, r, c), exit (l, r, c), obstacles
+
+DEFAULT_COUNT = 1000
+
+
+# Seed of level `index` in a pack built from `base_seed`
+def level_seed(base_seed, index):
+    return int(np.random.SeedSequence([base_seed, index]).generate_state(1)[0])
+
+
+def encode_level(layout, seed):
+    obstacles = np.ravel_multi_index(layout.obstacles.T, layout.walls.shape).astype("<u4")
+    return b"".join([
+        RECORD.pack(seed, *layout.start, *layout.exit, len(obstacles)),
+        np.packbits(layout.walls, axis=None).tobytes(),
+        np.packbits(layout.keys, axis=None).tobytes(),
+        obstacles.tobytes(),
+    ])
+
+
+def decode_level(buffer, offset, rows, cols):
+    shape = (2, rows, cols)
+    tiles = 2 * rows * cols
+    packed = (tiles + 7) // 8
+
+    seed, sl, sr, sc, el, er, ec, n_obstacles = RECORD.unpack_from(buffer, offset)
+    offset += RECORD.size
+    walls = np.unpackbits(np.frombuffer(buffer, np.uint8, packed, offset), count=tiles).view(bool)
+    offset += packed
+    keys = np.unpackbits(np.frombuffer(buffer, np.uint8, packed, offset), count=tiles).view(bool)
+    offset += packed
+    obstacles = np.frombuffer(buffer, "<u4", n_obstacles, offset)
+    obstacles = np.stack(np.unravel_index(obstacles, shape), axis=1).astype(np.int32)
+
+    return MazeLayout(walls.reshape(shape), keys.reshape(shape), obstacles,
+                      (sl, sr, sc), (el, er, ec), seed)
+
+
+def _build_level(args):
+    rows, cols, seed = args
+    return encode_level(generate_solvable_maze(rows, cols, seed), seed)
+
+
+# Generate `count` seeded, solvability-checked levels on a process pool and
+# stream them into a pack file. Levels are written in index order, so the
+# same arguments always produce the same file. The pack is built under a
+# temporary name and only renamed to `path` once complete, so a failed build
+# leaves no partial pack behind.
+def build_pack(path, count=DEFAULT_COUNT, rows=8, cols=20, base_seed=0, workers=None):
+    header = HEADER.pack(MAGIC, VERSION, count, rows, cols, base_seed)
+    index = np.zeros(count + 1, dtype="<u8")
+    jobs = ((rows, cols, level_seed(base_seed, i)) for i in range(count))
+    chunksize = max(1, min(64, count // ((workers or os.cpu_count() or 1) * 8)))
+
+    partial = path + ".partial"
+    try:
+        with open(partial, "wb") as f, Pool(workers) as pool:
+            f.write(header)
+            f.write(index.tobytes())
+            offset = HEADER.size + index.nbytes
+            for i, record in enumerate(pool.imap(_build_level, jobs, chunksize)):
+                index[i] = offset
+                f.write(record)
+                offset += len(record)
+            index[count] = offset
+            f.seek(HEADER.size)
+            f.write(index.tobytes())
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+
+# Read-only view of a pack file. The file is memory-mapped and only the
+# requested level is decoded, so opening a pack and switching levels do not
+# depend on how many levels it holds.
+class LevelPack:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, rows, cols, base_seed = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} maze pack")
+        self.rows = rows
+        self.cols = cols
+        self.base_seed = base_seed
+        self._index = np.frombuffer(self._map, "<u8", count + 1, HEADER.size)
+
+    def __len__(self):
+        return len(self._index) - 1
+
+    def __getitem__(self, i):
+        if not -len(self) <= i < len(self):
+            raise IndexError("level index out of range")
+        return decode_level(self._map, int(self._index[i % len(self)]), self.rows, self.cols)
+
+    def close(self):
+        self._index = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect Quantum Escape level packs.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="generate a level pack")
+    build.add_argument("path")
+    build.add_argument("--count", type=int, default=DEFAULT_COUNT)
+    build.add_argument("--rows", type=int, default=8)
+    build.add_argument("--cols", type=int, default=20)
+    build.add_argument("--seed", type=int, default=0)
+    build.add_argument("--workers", type=int, default=None)
+    info = sub.add_parser("info", help="describe a level pack")
+    info.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_pack(args.path, args.count, args.rows, args.cols, args.seed, args.workers)
+    with LevelPack(args.path) as pack:
+        size = os.path.getsize(args.path)
+        print(f"{args.path}: {len(pack)} levels of {pack.rows}x{pack.cols}, "
+              f"seed {pack.base_seed}, {size} bytes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import numpy as np
+
+UNREACHABLE = np.iinfo(np.int32).max
+
+# Moves in the order MazeEngine resolves them, as (action, d_row, d_col)
+DIRECTIONS = (
+    ("LEFT", 0, -1),
+    ("RIGHT", 0, 1),
+    ("UP", -1, 0),
+    ("DOWN", 1, 0),
+)
+
+
+# Breadth-first search backwards over flattened (layer, row, col) states.
+#
+# Moving into a tile costs 1 and needs the target tile open in the current
+# layer. The X gate swaps layers on the same tile for free and is allowed
+# even onto a wall (the player can then only step off it), so it is a
+# zero-distance edge between the two layers. `seeds` are (layer, row, col)
+# index arrays whose distance is already known (`seed_dist`); they join the
+# frontier at their own level, which makes this a bucketed multi-source
+# search.
+#
+# Every level is expanded as a whole with array operations, so the Python
+# overhead is per BFS level rather than per tile. The board is padded with
+# a one-tile border that counts as already visited, so neighbours need no
+# bounds checks.
+def _reverse_bfs(walls, seeds, seed_dist):
+    layers, rows, cols = walls.shape
+    width = cols + 2
+    plane = (rows + 2) * width
+    shape = (layers, rows + 2, width)
+
+    open_flat = np.zeros(shape, dtype=bool)
+    open_flat[:, 1:-1, 1:-1] = ~walls
+    open_flat = open_flat.reshape(-1)
+    dist = np.full(shape, -1, dtype=np.int32)
+    dist[:, 1:-1, 1:-1] = UNREACHABLE
+    dist = dist.reshape(-1)
+    stamp = np.empty(dist.size, dtype=np.int32)
+
+    order = np.argsort(seed_dist, kind="stable")
+    seed_dist = seed_dist[order]
+    seeds = np.ravel_multi_index((seeds[0][order], seeds[1][order] + 1, seeds[2][order] + 1),
+                                 shape).astype(np.int32)
+    seed_levels, seed_starts = np.unique(seed_dist, return_index=True)
+    seed_ends = dict(zip(seed_levels.tolist(), np.append(seed_starts[1:], len(seeds)).tolist()))
+    next_seed = 0
+
+    candidates = np.empty(0, dtype=np.int32)
+    level = int(seed_dist[0]) if len(seeds) else 0
+    while True:
+        # Seeds that start at this level
+        end = seed_ends.get(level, next_seed)
+        if end > next_seed:
+            candidates = np.concatenate([candidates, seeds[next_seed:end]])
+            next_seed = end
+
+        # Unvisited, deduplicated states at this level
+        candidates = candidates[dist[candidates] == UNREACHABLE]
+        if len(candidates):
+            index = np.arange(len(candidates), dtype=np.int32)
+            stamp[candidates] = index
+            candidates = candidates[stamp[candidates] == index]
+            dist[candidates] = level
+
+            # Free X gate: the same tile in the other layer
+            partners = np.where(candidates < plane, candidates + plane, candidates - plane)
+            partners = partners[dist[partners] == UNREACHABLE]
+            dist[partners] = level
+            frontier = np.concatenate([candidates, partners])
+        else:
+            frontier = candidates
+
+        if not len(frontier) and next_seed == len(seeds):
+            return dist.reshape(shape)[:, 1:-1, 1:-1].copy()
+
+        # Predecessors by a move: neighbours of every open frontier tile
+        frontier = frontier[open_flat[frontier]]
+        candidates = np.concatenate([frontier - 1, frontier + 1, frontier - width, frontier + width])
+        level += 1
+        if not len(candidates) and next_seed < len(seeds):
+            level = max(level, int(seed_dist[next_seed]))
+
+
+# Distance-to-escape for every (layer, row, col, has_key) state of a board.
+# Computed once per layout; lookups and hints afterwards are O(1).
+class DistanceField:
+    def __init__(self, walls, keys, exit):
+        self.walls = walls
+        self.keys = keys
+        # With a key, the goal is the exit tile itself
+        exit_tile = tuple(np.array([i]) for i in exit)
+        self.with_key = _reverse_bfs(walls, exit_tile, np.zeros(1, dtype=np.int32))
+
+        # Without one, reaching a key tile switches to the with-key field
+        key_tiles = np.nonzero(keys)
+        key_dist = self.with_key[key_tiles]
+        reachable = key_dist != UNREACHABLE
+        if reachable.any():
+            key_tiles = tuple(i[reachable] for i in key_tiles)
+            self.without_key = _reverse_bfs(walls, key_tiles, key_dist[reachable])
+        else:
+            self.without_key = np.full(walls.shape, UNREACHABLE, dtype=np.int32)
+
+    def distance(self, tile, has_key):
+        field = self.with_key if has_key or self.keys[tile] else self.without_key
+        return int(field[tile])
+
+    def solvable(self, start, has_key=False):
+        return self.distance(start, has_key) != UNREACHABLE
+
+    # Best action from `tile`: a MazeEngine move name, "X", or None when the
+    # exit cannot be reached from here.
+    def next_move(self, tile, has_key):
+        layer, row, col = tile
+        _, rows, cols = self.walls.shape
+        best, best_cost = None, UNREACHABLE
+        for action, d_row, d_col in DIRECTIONS:
+            target = (layer, row + d_row, col + d_col)
+            if not (0 <= target[1] < rows and 0 <= target[2] < cols) or self.walls[target]:
+                continue
+            cost = self.distance(target, has_key)
+            if cost != UNREACHABLE and cost + 1 < best_cost:
+                best, best_cost = action, cost + 1
+        swapped = self.distance((1 - layer, row, col), has_key)
+        if swapped < best_cost:
+            best = "X"
+        return best
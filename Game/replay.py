@@ -0,0 +1,65 @@
+import argparse
+import os
+import runpy
+import sys
+import time
+
+# Play back an input recording headlessly and as fast as possible, then
+# check the outcome against the one stored in the recording.
+#
+# Record a session with e.g.
+#   QE_SEED=42 QE_RECORD=run.qer python Rescue_v2.py
+# and replay it with
+#   python replay.py run.qer
+GAMES = {
+    "maze": "maze.py",
+    "Rescue": "Rescue.py",
+    "Rescue_v2": "Rescue_v2.py",
+    "Rescue_v3": "Rescue_v3.py",
+    "Rescue_v4": "Rescue_v4.py",
+    "bubbleTrobble": "bubbleTrobble.py",
+}
+GAME_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def replay(path, show=False):
+    os.environ["QE_REPLAY"] = os.path.abspath(path)
+    if not show:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    # Imported only now so pygame starts with the drivers chosen above
+    if GAME_DIR not in sys.path:
+        sys.path.insert(0, GAME_DIR)
+    import session
+
+    header, _ = session.load_recording(path)
+    script = GAMES[header["game"]]
+    sys.argv = [script] + header.get("argv", [])
+    os.chdir(GAME_DIR)
+
+    start = time.perf_counter()
+    runpy.run_path(script, run_name="__main__")
+    elapsed = time.perf_counter() - start
+    return session.last_session, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded game session")
+    parser.add_argument("recording", help="file written with QE_RECORD")
+    parser.add_argument("--show", action="store_true", help="open a window instead of running headless")
+    args = parser.parse_args()
+
+    result, elapsed = replay(args.recording, args.show)
+    frames = result.result["frames"]
+    print(f"{result.game}: {frames} frames in {elapsed:.2f}s ({frames / max(elapsed, 1e-9):.0f} frames/s)")
+    if result.replay_matches:
+        print("result matches the recording:", result.result)
+        return
+    print("result differs from the recording")
+    print("  recorded:", result.expected)
+    print("  replayed:", result.result)
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
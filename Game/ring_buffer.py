@@ -0,0 +1,53 @@
+import pygame
+
+
+# A fixed-capacity FIFO of preallocated, same-sized pygame.Rects, for
+# objects that leave in the order they arrived (all rockets fly at the same
+# speed, so the oldest is always the first to leave the screen).
+#
+# push() reuses the slot after the newest rect, expire() drops the oldest
+# ones by advancing the head index, and kill() retires a rect in the middle
+# by giving it zero width: it then collides with nothing, and its slot is
+# reclaimed once it becomes the oldest. Indexing and iteration run from the
+# oldest rect to the newest, killed ones included.
+class RectRing:
+    def __init__(self, capacity, width, height):
+        self.capacity = capacity
+        self.width = width
+        self.rects = [pygame.Rect(0, 0, width, height) for _ in range(capacity)]
+        self.head = 0
+        self.count = 0
+
+    # Place a new rect at (x, y); False if the ring is full
+    def push(self, x, y):
+        if self.count == self.capacity:
+            return False
+        rect = self.rects[(self.head + self.count) % self.capacity]
+        rect.topleft = (x, y)
+        rect.width = self.width
+        self.count += 1
+        return True
+
+    def kill(self, i):
+        self[i].width = 0
+
+    # Drop rects from the oldest end while they are killed or gone(rect)
+    def expire(self, gone):
+        while self.count:
+            rect = self.rects[self.head]
+            if rect.width and not gone(rect):
+                break
+            self.head = (self.head + 1) % self.capacity
+            self.count -= 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return self.rects[(self.head + i) % self.capacity]
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.rects[(self.head + i) % self.capacity]
+
+    def __len__(self):
+        return self.count
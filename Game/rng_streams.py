@@ -0,0 +1,43 @@
+import random
+import numpy as np
+
+# Independent random streams per subsystem, so that e.g. an extra spawn
+# draw never shifts which gates fire or how a measurement collapses.
+STREAMS = ("spawn", "gates", "collapse")
+
+
+# Seeded random streams derived from one master seed. Each stream is
+# available as a random.Random (stream / attribute access) and as a NumPy
+# Generator (generator), both fully determined by (seed, stream name).
+class RngStreams:
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(63)
+        self.seed = seed
+        children = np.random.SeedSequence(seed).spawn(len(STREAMS))
+        self._sequences = dict(zip(STREAMS, children))
+        self._randoms = {}
+        self._generators = {}
+
+    def stream(self, name):
+        if name not in self._randoms:
+            state = self._sequences[name].generate_state(4, np.uint32)
+            self._randoms[name] = random.Random(int.from_bytes(state.tobytes(), "little"))
+        return self._randoms[name]
+
+    def generator(self, name):
+        if name not in self._generators:
+            self._generators[name] = np.random.default_rng(self._sequences[name].spawn(1)[0])
+        return self._generators[name]
+
+    @property
+    def spawn(self):
+        return self.stream("spawn")
+
+    @property
+    def gates(self):
+        return self.stream("gates")
+
+    @property
+    def collapse(self):
+        return self.stream("collapse")
@@ -0,0 +1,207 @@
+import json
+import os
+import struct
+import zlib
+
+import pygame
+from rng_streams import RngStreams
+
+# Environment configuration shared by every game:
+#   QE_SEED        master seed for the RNG streams (default: random)
+#   QE_RECORD      write this session's inputs to the given file
+#   QE_REPLAY      play back a recording instead of reading the keyboard;
+#                  the frame clock is not throttled
+#   QE_MAX_FRAMES  end the session after this many frames
+MAGIC = b"QER1"
+# One run of identical frames: held keys, pressed-this-frame keys, mouse
+# buttons, mouse x, mouse y, number of frames
+RUN = struct.Struct("<IIBhhI")
+
+# The most recently finished session, for replay.py and benchmarks
+last_session = None
+# Callables run with the session at the end of every frame (benchmarks)
+frame_hooks = []
+
+
+# Keys held during a frame, indexable like pygame.key.get_pressed()
+class Pressed:
+    def __init__(self, mask, bits):
+        self.mask = mask
+        self.bits = bits
+
+    def __getitem__(self, key):
+        bit = self.bits.get(key)
+        return bit is not None and bool(self.mask >> bit & 1)
+
+
+# One play session of a game: RNG streams, frame pacing and keyboard/mouse
+# input, which is either read live (and optionally recorded) or replayed
+# from a recording.
+#
+# A game calls events(), pressed() and mouse() instead of the pygame
+# functions, and tick() once at the end of every frame. Only the keys listed
+# in `keys` are tracked; each frame is stored as a few bitmasks and runs of
+# identical frames are merged, so recordings stay small.
+class Session:
+    def __init__(self, game, keys, seed=None, record=None, replay=None, max_frames=None, argv=()):
+        self.game = game
+        self.argv = list(argv)
+        self.keys = list(keys)
+        self.bits = {key: i for i, key in enumerate(self.keys)}
+        self.record_path = record
+        self.replay_path = replay
+        self.max_frames = max_frames
+        self.frame = 0
+        self.result = None
+        self.expected = None
+
+        self._runs = []
+        self._current = None
+        if replay:
+            header, self._replay_runs = load_recording(replay)
+            if header["game"] != game:
+                raise ValueError(f"{replay} is a recording of {header['game']}, not {game}")
+            seed = header["seed"]
+            self.argv = header.get("argv", [])
+            self.expected = header.get("result")
+            self.keys = [pygame.key.key_code(name) for name in header["keys"]]
+            self.bits = {key: i for i, key in enumerate(self.keys)}
+            self._run_index = 0
+            self._run_left = self._replay_runs[0][-1] if self._replay_runs else 0
+            self._replay_frames = sum(run[-1] for run in self._replay_runs)
+        self.rng = RngStreams(seed)
+
+    # Session configured from the QE_* environment variables; QE_SEED
+    # overrides `seed`
+    @classmethod
+    def from_env(cls, game, keys, argv=(), seed=None):
+        env_seed = os.environ.get("QE_SEED")
+        max_frames = os.environ.get("QE_MAX_FRAMES")
+        return cls(game, keys,
+                   seed=int(env_seed) if env_seed else seed,
+                   record=os.environ.get("QE_RECORD") or None,
+                   replay=os.environ.get("QE_REPLAY") or None,
+                   max_frames=int(max_frames) if max_frames else None,
+                   argv=argv)
+
+    @property
+    def replaying(self):
+        return self.replay_path is not None
+
+    @property
+    def finished_input(self):
+        if self.max_frames is not None and self.frame >= self.max_frames:
+            return True
+        # The recorded session ended during its last frame
+        return self.replaying and self.frame >= self._replay_frames - 1
+
+    # This frame's (held mask, pressed mask, mouse buttons, mouse x, mouse y)
+    def _frame_input(self):
+        if self._current is not None:
+            return self._current
+        if self.replaying:
+            if self._run_index < len(self._replay_runs):
+                self._current = self._replay_runs[self._run_index][:5]
+            else:
+                self._current = (0, 0, 0, 0, 0)
+        else:
+            held = pygame.key.get_pressed()
+            mask = 0
+            for key, bit in self.bits.items():
+                if held[key]:
+                    mask |= 1 << bit
+            self._current = [mask, 0, 0, 0, 0]
+        return self._current
+
+    # pygame.event.get(), plus a QUIT once the recording or frame budget runs out
+    def events(self):
+        if self.replaying:
+            pygame.event.pump()
+            down = self._frame_input()[1]
+            events = [pygame.event.Event(pygame.KEYDOWN, key=key, mod=0, unicode="", scancode=0)
+                      for key, bit in self.bits.items() if down >> bit & 1]
+        else:
+            events = pygame.event.get()
+            current = self._frame_input()
+            for event in events:
+                if event.type == pygame.KEYDOWN and event.key in self.bits:
+                    current[1] |= 1 << self.bits[event.key]
+        if self.finished_input:
+            events.append(pygame.event.Event(pygame.QUIT))
+        return events
+
+    def pressed(self):
+        return Pressed(self._frame_input()[0], self.bits)
+
+    # (buttons, (x, y)) like pygame.mouse.get_pressed() / get_pos()
+    def mouse(self):
+        current = self._frame_input()
+        if not self.replaying and not current[2]:
+            buttons = pygame.mouse.get_pressed()
+            current[2] = 8 | buttons[0] | buttons[1] << 1 | buttons[2] << 2
+            current[3], current[4] = pygame.mouse.get_pos()
+        buttons = current[2]
+        return (bool(buttons & 1), bool(buttons & 2), bool(buttons & 4)), (current[3], current[4])
+
+    # End of frame: store or advance the input, then wait for the next frame
+    # unless replaying, which runs as fast as possible
+    def tick(self, clock, fps):
+        current = tuple(self._frame_input())
+        self._current = None
+        self.frame += 1
+        for hook in frame_hooks:
+            hook(self)
+        if self.replaying:
+            self._run_left -= 1
+            if self._run_left <= 0:
+                self._run_index += 1
+                if self._run_index < len(self._replay_runs):
+                    self._run_left = self._replay_runs[self._run_index][-1]
+            return 0
+        if self._runs and self._runs[-1][:5] == current:
+            self._runs[-1][5] += 1
+        else:
+            self._runs.append(list(current) + [1])
+        return clock.tick(fps)
+
+    # Record the outcome of the session. When recording, the file is written
+    # with the result so replays can be checked against it.
+    def finish(self, **result):
+        global last_session
+        self.result = dict(result, frames=self.frame)
+        last_session = self
+        if self.record_path and not self.replaying:
+            save_recording(self.record_path, {
+                "game": self.game,
+                "seed": self.rng.seed,
+                "argv": self.argv,
+                "keys": [pygame.key.name(key) for key in self.keys],
+                "result": self.result,
+            }, self._runs)
+        return self.result
+
+    @property
+    def replay_matches(self):
+        return self.expected is not None and self.result == self.expected
+
+
+def save_recording(path, header, runs):
+    header = json.dumps(header, sort_keys=True).encode("utf-8")
+    body = zlib.compress(b"".join(RUN.pack(*run) for run in runs), 9)
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(body)
+
+
+def load_recording(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != MAGIC:
+        raise ValueError(f"{path} is not an input recording")
+    (length,) = struct.unpack_from("<I", data, 4)
+    header = json.loads(data[8:8 + length].decode("utf-8"))
+    body = zlib.decompress(data[8 + length:])
+    runs = [RUN.unpack_from(body, offset) for offset in range(0, len(body), RUN.size)]
+    return header, runs
@@ -0,0 +1,91 @@
+import threading
+
+import pygame
+
+CHANNELS = 8
+
+
+# Sound effects behind a fixed pool of mixer channels.
+#
+# Sounds are registered by key with a priority and a rate limit, and are
+# only decoded when first played (or ahead of time on a background thread
+# with prefetch()). play() just notes the request: every request for the
+# same sound within a frame is merged, and update(), called once per frame,
+# starts each requested sound at most once. A sound that played less than
+# `min_gap` frames ago is skipped. When all channels are busy, a new sound
+# takes over the channel of the lowest-priority sound playing, provided
+# that one has a lower priority; otherwise it is dropped.
+#
+# Without a working mixer the service stays silent.
+class SoundService:
+    def __init__(self, assets, channels=CHANNELS):
+        self.assets = assets
+        self.enabled = pygame.mixer.get_init() is not None
+        self.specs = {}
+        self.loaded = {}
+        self.requested = set()
+        self.last_played = {}
+        self.frame = 0
+        self._lock = threading.Lock()
+        self._channels = []
+        self._playing = []
+        if self.enabled:
+            pygame.mixer.set_num_channels(max(channels, pygame.mixer.get_num_channels()))
+            self._channels = [pygame.mixer.Channel(i) for i in range(channels)]
+            self._playing = [None] * channels
+
+    def add(self, key, name, priority=0, min_gap=0, volume=1.0):
+        self.specs[key] = (name, priority, min_gap, volume)
+
+    def _sound(self, key):
+        with self._lock:
+            sound = self.loaded.get(key)
+            if sound is None:
+                name, _, _, volume = self.specs[key]
+                sound = self.assets.sound(name)
+                sound.set_volume(volume)
+                self.loaded[key] = sound
+            return sound
+
+    # Decode every registered sound on a background thread
+    def prefetch(self):
+        if not self.enabled:
+            return None
+        thread = threading.Thread(target=lambda: [self._sound(key) for key in list(self.specs)], daemon=True)
+        thread.start()
+        return thread
+
+    def play(self, key):
+        if self.enabled:
+            self.requested.add(key)
+
+    # A channel for a sound of `priority`: a free one, else the one playing
+    # the lowest-priority sound if that is below `priority`
+    def _channel(self, priority):
+        victim = None
+        for i, channel in enumerate(self._channels):
+            if not channel.get_busy():
+                return i
+            playing = self._playing[i]
+            if playing is not None and self.specs[playing][1] < priority and (
+                    victim is None or self.specs[playing][1] < self.specs[self._playing[victim]][1]):
+                victim = i
+        return victim
+
+    def update(self):
+        self.frame += 1
+        if not self.requested:
+            return
+        # Highest priority first, so they get the channels
+        for key in sorted(self.requested, key=lambda k: (-self.specs[k][1], k)):
+            _, priority, min_gap, _ = self.specs[key]
+            last = self.last_played.get(key)
+            if last is not None and self.frame - last < min_gap:
+                continue
+            i = self._channel(priority)
+            if i is None:
+                continue
+            self._channels[i].play(self._sound(key))
+            self._playing[i] = key
+            self.last_played[key] = self.frame
+        self.requested.clear()
@@ -0,0 +1,98 @@
+import numpy as np
+
+
+# Phase exponent (power of i) picked up when multiplying Pauli (x1, z1) into
+# (x2, z2), elementwise over int arrays, as in Aaronson & Gottesman's CHP.
+def _g(x1, z1, x2, z2):
+    return ((x1 & z1) * (z2 - x2)
+            + (x1 & (1 - z1)) * (z2 * (2 * x2 - 1))
+            + ((1 - x1) & z1) * (x2 * (1 - 2 * z2)))
+
+
+# Stabilizer tableau for n qubits (Aaronson-Gottesman "CHP" form).
+#
+# Rows 0..n-1 are destabilizers and rows n..2n-1 stabilizers; each row is a
+# Pauli string stored as x/z bit columns plus a sign bit r. Clifford gates
+# (H, S, X, Z, CNOT) update one or two columns for all rows at once and
+# measurement is O(n^2), so hundreds of entangled qubits stay cheap where a
+# state vector would need 2^n amplitudes.
+class Tableau:
+    def __init__(self, n, rng=None):
+        self.n = n
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.x = np.zeros((2 * n, n), dtype=np.int8)
+        self.z = np.zeros((2 * n, n), dtype=np.int8)
+        self.r = np.zeros(2 * n, dtype=np.int8)
+        self.x[np.arange(n), np.arange(n)] = 1
+        self.z[n + np.arange(n), np.arange(n)] = 1
+
+    # Gates
+    def h(self, a):
+        self.r ^= self.x[:, a] & self.z[:, a]
+        self.x[:, a], self.z[:, a] = self.z[:, a].copy(), self.x[:, a].copy()
+
+    def s(self, a):
+        self.r ^= self.x[:, a] & self.z[:, a]
+        self.z[:, a] ^= self.x[:, a]
+
+    def x_gate(self, a):
+        self.r ^= self.z[:, a]
+
+    def z_gate(self, a):
+        self.r ^= self.x[:, a]
+
+    def cnot(self, control, target):
+        xc, zc = self.x[:, control], self.z[:, control]
+        xt, zt = self.x[:, target], self.z[:, target]
+        self.r ^= xc & zt & (xt ^ zc ^ 1)
+        xt ^= xc
+        zc ^= zt
+
+    # Measurement
+    def is_deterministic(self, a):
+        return not self.x[self.n:, a].any()
+
+    # Outcome a Z measurement of qubit `a` would give, without disturbing
+    # the state; None if it would be random
+    def peek(self, a):
+        if not self.is_deterministic(a):
+            return None
+        # The product of the stabilizers paired with the destabilizers that
+        # anticommute with Z_a is +-Z_a. Its sign is found by accumulating
+        # phases over a running (prefix XOR) product, all in one pass.
+        rows = self.n + np.flatnonzero(self.x[:self.n, a])
+        x, z = self.x[rows].astype(np.int16), self.z[rows].astype(np.int16)
+        acc_x = np.bitwise_xor.accumulate(x, axis=0)
+        acc_z = np.bitwise_xor.accumulate(z, axis=0)
+        prev_x = np.vstack([np.zeros((1, self.n), np.int16), acc_x[:-1]])
+        prev_z = np.vstack([np.zeros((1, self.n), np.int16), acc_z[:-1]])
+        phase = 2 * int(self.r[rows].sum()) + int(_g(x, z, prev_x, prev_z).sum())
+        return int(phase % 4 == 2)
+
+    # Measure qubit `a` in the Z basis, collapsing the joint state
+    def measure(self, a):
+        n = self.n
+        pivots = n + np.flatnonzero(self.x[n:, a])
+        if not len(pivots):
+            return self.peek(a)
+
+        p = pivots[0]
+        # Multiply row p into every other row that anticommutes with Z_a
+        rows = np.flatnonzero(self.x[:, a])
+        rows = rows[rows != p]
+        if len(rows):
+            xp, zp = self.x[p].astype(np.int16), self.z[p].astype(np.int16)
+            xh, zh = self.x[rows].astype(np.int16), self.z[rows].astype(np.int16)
+            phase = 2 * self.r[rows].astype(np.int16) + 2 * int(self.r[p]) + _g(xp, zp, xh, zh).sum(axis=1)
+            self.r[rows] = (phase % 4 == 2)
+            self.x[rows] ^= self.x[p]
+            self.z[rows] ^= self.z[p]
+
+        # Row p becomes its own destabilizer and is replaced by +-Z_a
+        self.x[p - n], self.z[p - n], self.r[p - n] = self.x[p], self.z[p], self.r[p]
+        outcome = int(self.rng.integers(2))
+        self.x[p] = 0
+        self.z[p] = 0
+        self.z[p, a] = 1
+        self.r[p] = outcome
+        return outcome
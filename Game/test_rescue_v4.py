@@ -0,0 +1,47 @@
+import os
+import random
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from Rescue_v4 import AutoPlayer, BubbleGrid, Cannon, BUBBLE_RADIUS, GRID_LEFT, HEIGHT
+
+
+# Fly a shot straight up from the bottom, `speed` pixels a frame, and stick
+# it the way the game loop does
+def fire_up(grid, col, speed):
+    x = GRID_LEFT + (2 * col + 1) * BUBBLE_RADIUS
+    y = HEIGHT - 50
+    while True:
+        t = grid.sweep(x, y, x, y - speed)
+        if t is not None:
+            return grid.place_bubble(x, y - t * speed, '0')
+        y -= speed
+
+
+def test_shot_up_empty_column_lands_in_top_row():
+    for speed in (8, 13, 90, 1000):
+        grid = BubbleGrid(random.Random(0), filled_rows=0)
+        bubble = fire_up(grid, 3, speed)
+        assert (bubble.row, bubble.col) == (0, 3)
+        assert grid.grid[0][3] is bubble
+
+
+def test_shot_sticks_below_filled_column():
+    grid = BubbleGrid(random.Random(0), filled_rows=2)
+    bubble = fire_up(grid, 5, 8)
+    assert (bubble.row, bubble.col) == (2, 5)
+
+
+# At 60 degrees and speed 8 the shot meets the right wall exactly on frame
+# 55, where float drift in the stepped x decides the bounce
+def test_bot_paths_bounce_on_the_frames_the_cannon_does():
+    cannon = Cannon(random.Random(0), speed=8)
+    bot = AutoPlayer()
+    xs, ys = bot.paths(cannon)
+    row = bot.angles.tolist().index(60)
+    cannon.angle = 60
+    cannon.shoot()
+    for k in range(1, xs.shape[1]):
+        cannon.update()
+        assert (xs[row, k], ys[row, k]) == (cannon.shoot_x, cannon.shoot_y)
@@ -0,0 +1,43 @@
+from collections import OrderedDict
+
+import pygame
+
+CAPACITY = 256
+
+
+# Rendered text surfaces, keyed by (text, size, color).
+#
+# Fonts are resolved once per size; rendered labels are kept in LRU order
+# and the least recently used one is dropped once more than `capacity` are
+# held. Labels that change every frame (scores, timers) only cost a render
+# when their text actually changes.
+class TextCache:
+    def __init__(self, name="Arial", capacity=CAPACITY, antialias=True):
+        self.name = name
+        self.capacity = capacity
+        self.antialias = antialias
+        self.fonts = {}
+        self.labels = OrderedDict()
+        self.hits = self.misses = 0
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pygame.font.SysFont(self.name, size)
+        return font
+
+    def render(self, text, size, color):
+        key = (text, size, tuple(color))
+        label = self.labels.get(key)
+        if label is not None:
+            self.labels.move_to_end(key)
+            self.hits += 1
+            return label
+        self.misses += 1
+        label = self.labels[key] = self.font(size).render(text, self.antialias, color)
+        if len(self.labels) > self.capacity:
+            self.labels.popitem(last=False)
+        return label
+
+    def draw(self, surface, text, size, color, x, y):
+        return surface.blit(self.render(text, size, color), (x, y))